@@ -2,11 +2,11 @@ from django.contrib import admin
 from .resources import CategoryResource
 from import_export.admin import ImportMixin
 from .models import (Recipe, Tag, Ingredient, IngredientRecipe, ShoppingList,
-                     Favorite, Follow)
+                     Favorite, Follow, RecipeScore)
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'author')
+    list_display = ('pk', 'name', 'author', 'favorites_count')
     list_filter = ('author', 'name', 'tags')
 
 
@@ -27,3 +27,4 @@ admin.site.register(Tag)
 admin.site.register(ShoppingList)
 admin.site.register(Favorite)
 admin.site.register(Follow)
+admin.site.register(RecipeScore)
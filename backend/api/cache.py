@@ -0,0 +1,88 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from .models import CacheVersion
+
+
+def get_version(namespace):
+    """
+    Version of the namespace, read from the database at most once per
+    CACHE_VERSION_TIMEOUT seconds, so a bump made by another process
+    is seen even when the cache is local to each process.
+    """
+    key = f'{namespace}:version'
+    version = cache.get(key)
+    if version is None:
+        version = CacheVersion.objects.filter(
+            namespace=namespace).values_list('version', flat=True).first()
+        version = version or ''
+        cache.set(key, version, settings.CACHE_VERSION_TIMEOUT)
+    return version
+
+
+def bump_version(namespace):
+    """
+    Invalidates every cached entry of the namespace at once:
+    the version is part of all its keys.
+    """
+    version = uuid.uuid4().hex
+    CacheVersion.objects.update_or_create(
+        namespace=namespace, defaults={'version': version})
+    cache.set(f'{namespace}:version', version,
+              settings.CACHE_VERSION_TIMEOUT)
+
+
+class CachedResponseMixin:
+    """
+    Stores rendered JSON of read-only endpoints in the Django cache
+    and answers conditional GETs with 304 using ETag/Last-Modified.
+    Subclasses set cache_namespace and wrap their handlers with
+    cached_response(); the namespace is invalidated by bump_version().
+    Entries also expire after cache_timeout seconds, which bounds how
+    long a worker can miss an invalidation made in another process.
+    """
+    cache_namespace = None
+    cache_timeout = settings.RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_key(self, request):
+        version = get_version(self.cache_namespace)
+        return f'{self.cache_namespace}:{version}:{request.get_full_path()}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            body = JSONRenderer().render(response.data)
+            cached = (body, hashlib.md5(body).hexdigest(), int(time.time()))
+            cache.set(key, cached, self.cache_timeout)
+        body, digest, modified = cached
+        etag = f'"{digest}"'
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if if_none_match is not None:
+            not_modified = (etag in parse_etags(if_none_match)
+                            or if_none_match.strip() == '*')
+        else:
+            not_modified = (if_modified_since is not None
+                            and modified <= if_modified_since)
+        if not_modified:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        return response
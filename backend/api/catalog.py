@@ -0,0 +1,72 @@
+import threading
+from bisect import bisect_left
+
+from .cache import bump_version, get_version
+from .models import Ingredient
+
+
+class IngredientCatalog:
+    """
+    Process-local copy of the ingredient table for autocomplete.
+    Names are kept lowercased in a sorted list next to the serialized
+    ingredients, so a prefix lookup is a bisect plus a short scan.
+    The catalog is rebuilt when the 'ingredients' cache version changes,
+    which lets other workers drop their copy on a shared cache backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._names = None
+        self._items = None
+
+    def invalidate(self):
+        bump_version('ingredients')
+        with self._lock:
+            self._names = self._items = None
+
+    def _load(self):
+        version = get_version('ingredients')
+        names, items = self._names, self._items
+        if names is not None and version == self._version:
+            return names, items
+        with self._lock:
+            ingredients = Ingredient.objects.order_by().values(
+                'id', 'name', 'measurement_unit')
+            self._items = sorted(
+                ingredients, key=lambda item: item['name'].lower())
+            self._names = [item['name'].lower() for item in self._items]
+            self._version = version
+            return self._names, self._items
+
+    def all(self):
+        return self._load()[1]
+
+    def startswith(self, prefix, limit=None):
+        names, items = self._load()
+        prefix = prefix.lower()
+        start = bisect_left(names, prefix)
+        end = start
+        while (end < len(names) and names[end].startswith(prefix)
+               and (limit is None or end - start < limit)):
+            end += 1
+        return items[start:end]
+
+    def search(self, text, limit):
+        """
+        Prefix matches first, then the other substring matches.
+        """
+        result = self.startswith(text, limit)
+        if len(result) >= limit:
+            return result
+        names, items = self._load()
+        text = text.lower()
+        for name, item in zip(names, items):
+            if text in name and not name.startswith(text):
+                result.append(item)
+                if len(result) >= limit:
+                    break
+        return result
+
+
+ingredient_catalog = IngredientCatalog()
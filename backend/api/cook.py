@@ -0,0 +1,149 @@
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .cache import bump_version, get_version
+from .models import IngredientRecipe, RecipeIngredientChange
+
+logger = logging.getLogger(__name__)
+
+# Changes are read again for this long after a sync, so a transaction
+# that commits a little after its change row was written is not missed.
+COMMIT_MARGIN = timedelta(seconds=60)
+
+
+class RecipeIngredientIndex:
+    """
+    Process-local inverted index ingredient -> recipes for the
+    "what can I cook" search. Matching counts the recipes of each
+    available ingredient, so no GROUP BY query runs per request.
+
+    A change of the ingredients of a recipe is written to
+    RecipeIngredientChange and bumps the 'recipe_ingredients' version.
+    Each process then reloads only the changed recipes. The whole index
+    is rebuilt, in a background thread while the old one keeps serving,
+    only when more than COOK_INDEX_PATCH_LIMIT recipes changed or the
+    process has missed changes older than COOK_INDEX_RETENTION.
+    Posting sets are replaced, never modified, so matching needs no lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._synced = None
+        self._recipes = None
+        self._ingredients = None
+        self._rebuilding = False
+
+    def changed(self, recipe_id):
+        """
+        Records a change of the recipe's ingredients, call it in the
+        transaction that makes the change.
+        """
+        now = timezone.now()
+        RecipeIngredientChange.objects.create(recipe_id=recipe_id)
+        RecipeIngredientChange.objects.filter(created__lt=now - timedelta(
+            seconds=settings.COOK_INDEX_RETENTION)).delete()
+        transaction.on_commit(lambda: bump_version('recipe_ingredients'))
+
+    def _build(self):
+        recipes, ingredients = {}, {}
+        rows = IngredientRecipe.objects.order_by().values_list(
+            'recipe_id', 'ingredient_id').distinct()
+        for recipe_id, ingredient_id in rows.iterator(chunk_size=10000):
+            recipes.setdefault(ingredient_id, set()).add(recipe_id)
+            ingredients.setdefault(recipe_id, set()).add(ingredient_id)
+        return ({pk: frozenset(ids) for pk, ids in recipes.items()},
+                {pk: frozenset(ids) for pk, ids in ingredients.items()})
+
+    def _rebuild(self, version):
+        started = timezone.now()
+        recipes, ingredients = self._build()
+        with self._lock:
+            self._recipes, self._ingredients = recipes, ingredients
+            self._version, self._synced = version, started
+
+    def _rebuild_in_background(self, version):
+        close_old_connections()
+        try:
+            self._rebuild(version)
+        except Exception:
+            logger.exception('Could not rebuild the recipe ingredient index')
+        finally:
+            self._rebuilding = False
+            close_old_connections()
+
+    def _patch(self, recipe_ids):
+        rows = IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids).values_list('recipe_id', 'ingredient_id')
+        current = {pk: set() for pk in recipe_ids}
+        for recipe_id, ingredient_id in rows:
+            current[recipe_id].add(ingredient_id)
+        for recipe_id, ingredient_ids in current.items():
+            old = self._ingredients.get(recipe_id, frozenset())
+            for ingredient_id in old - ingredient_ids:
+                self._recipes[ingredient_id] = (
+                    self._recipes[ingredient_id] - {recipe_id})
+            for ingredient_id in ingredient_ids - old:
+                self._recipes[ingredient_id] = self._recipes.get(
+                    ingredient_id, frozenset()) | {recipe_id}
+            if ingredient_ids:
+                self._ingredients[recipe_id] = frozenset(ingredient_ids)
+            else:
+                self._ingredients.pop(recipe_id, None)
+
+    def _sync(self):
+        version = get_version('recipe_ingredients')
+        if self._recipes is not None and version == self._version:
+            return
+        if self._recipes is None:
+            self._rebuild(version)
+            return
+        with self._lock:
+            if version == self._version or self._rebuilding:
+                return
+            started = timezone.now()
+            expired = self._synced < started - timedelta(
+                seconds=settings.COOK_INDEX_RETENTION)
+            recipe_ids = set()
+            if not expired:
+                recipe_ids = set(RecipeIngredientChange.objects.filter(
+                    created__gte=self._synced - COMMIT_MARGIN
+                ).values_list('recipe_id', flat=True)[
+                    :settings.COOK_INDEX_PATCH_LIMIT + 1])
+            if expired or len(recipe_ids) > settings.COOK_INDEX_PATCH_LIMIT:
+                self._rebuilding = True
+                threading.Thread(
+                    target=self._rebuild_in_background, args=(version,),
+                    daemon=True).start()
+                return
+            self._patch(recipe_ids)
+            self._version, self._synced = version, started
+
+    def match(self, ingredient_ids, max_missing=0):
+        """
+        (recipe id, matched, missing) of the recipes using at least one
+        of the ingredients and lacking at most max_missing others,
+        the best covered recipes first.
+        """
+        self._sync()
+        recipes, ingredients = self._recipes, self._ingredients
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(recipes.get(ingredient_id, ()))
+        result = []
+        for recipe_id, count in matched.items():
+            missing = len(ingredients.get(recipe_id, ())) - count
+            if 0 <= missing <= max_missing:
+                result.append((recipe_id, count, missing))
+        result.sort(key=lambda item: (
+            -item[1] / (item[1] + item[2]), -item[1], -item[0]))
+        return result
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
@@ -0,0 +1,78 @@
+from django.conf import settings
+from django.db.models import Count, Q
+
+from users.models import User
+from .models import FeedItem, Follow, Recipe
+
+
+def fan_out(recipe):
+    """
+    Copies a new recipe into the feeds of the author's followers.
+    """
+    followers_count = User.objects.values_list(
+        'followers_count', flat=True).get(id=recipe.author_id)
+    if followers_count > settings.FEED_FANOUT_LIMIT:
+        return
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe=recipe) for user_id in followers),
+        ignore_conflicts=True)
+
+
+def backfill(follow):
+    """
+    Adds the latest recipes of a newly followed author to the feed.
+    """
+    recipes = Recipe.objects.filter(
+        author_id=follow.author_id
+    ).order_by('-pub_date', '-id').values_list(
+        'id', flat=True)[:settings.FEED_BACKFILL_LIMIT]
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=follow.user_id, recipe_id=recipe_id)
+         for recipe_id in recipes),
+        ignore_conflicts=True)
+
+
+def remove(follow):
+    FeedItem.objects.filter(
+        user_id=follow.user_id, recipe__author_id=follow.author_id).delete()
+
+
+def refill(author_id):
+    """
+    Copies into the followers' feeds the recipes the author published
+    while having more than FEED_FANOUT_LIMIT followers. Those were read
+    on the fly and are missing from the feeds, so they would disappear
+    once the author is back under the limit.
+    """
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    followers_count = followers.count()
+    recipes = list(Recipe.objects.filter(author_id=author_id).annotate(
+        delivered=Count('feed_items', filter=Q(
+            feed_items__user__follower__author_id=author_id))
+    ).filter(delivered__lt=followers_count).order_by(
+        '-pub_date', '-id').values_list(
+        'id', flat=True)[:settings.FEED_BACKFILL_LIMIT])
+    if not recipes:
+        return
+    FeedItem.objects.bulk_create(
+        (FeedItem(user_id=user_id, recipe_id=recipe_id)
+         for user_id in followers.iterator() for recipe_id in recipes),
+        batch_size=1000, ignore_conflicts=True)
+
+
+def feed_queryset(user, queryset=None):
+    """
+    Recipes from the inbox of the user plus, read on the fly, recipes
+    of the followed authors that are too popular for fan-out.
+    """
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    inbox = FeedItem.objects.filter(user=user).values('recipe_id')
+    popular_authors = User.objects.filter(
+        following__user=user,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values('id')
+    return queryset.filter(
+        Q(id__in=inbox) | Q(author_id__in=popular_authors))
@@ -0,0 +1,13 @@
+import hashlib
+
+from drf_extra_fields.fields import Base64ImageField
+
+
+class HashedBase64ImageField(Base64ImageField):
+    """
+    Base64 image named after its content, so an unchanged upload
+    keeps the same file name and does not have to be stored again.
+    """
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()[:32]
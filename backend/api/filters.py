@@ -1,5 +1,8 @@
 import django_filters as filters
-from .models import Recipe, Ingredient
+from django.db.models import Exists, OuterRef
+from django_filters.widgets import BooleanWidget
+from .models import Favorite, Ingredient, Recipe, ShoppingList, Tag
+from .search import search_recipes
 
 
 class IngredientNameFilter(filters.FilterSet):
@@ -11,23 +14,49 @@ class IngredientNameFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
-    is_favorited = filters.BooleanFilter(method='get_favorite')
+    """
+    Every predicate is an Exists subquery on the incoming queryset,
+    so the filters compose without joins and duplicate rows.
+    """
+    tags = filters.ModelMultipleChoiceFilter(
+        field_name='tags__slug',
+        to_field_name='slug',
+        queryset=Tag.objects.all(),
+        method='get_tags')
+    is_favorited = filters.BooleanFilter(
+        method='get_favorite', widget=BooleanWidget())
     is_in_shopping_cart = filters.BooleanFilter(
-        method='get_is_in_shopping_cart')
+        method='get_is_in_shopping_cart', widget=BooleanWidget())
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+        fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags',
+                  'search')
+
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value)))
+
+    def get_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
 
     def get_favorite(self, queryset, name, value):
-        user = self.request.user
-        if value:
-            return Recipe.objects.filter(favorites__user=user)
-        return Recipe.objects.all()
+        return self.filter_user_list(queryset, Favorite, value)
 
     def get_is_in_shopping_cart(self, queryset, name, value):
+        return self.filter_user_list(queryset, ShoppingList, value)
+
+    def filter_user_list(self, queryset, model, value):
         user = self.request.user
-        if value:
-            return Recipe.objects.filter(shopping_list__user=user)
-        return Recipe.objects.all()
+        if not value:
+            return queryset
+        if user.is_anonymous:
+            return queryset.none()
+        return queryset.filter(Exists(model.objects.filter(
+            user=user, recipe=OuterRef('pk'))))
@@ -0,0 +1,149 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from .cache import bump_version
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Square WebP variants of every recipe image, one per size. The API
+# serves the one selected with ?image_size=, see thumbnail_url().
+THUMBNAIL_SIZES = (160, 320, 640, 1280)
+VARIANT_FORMAT = 'WEBP'
+VARIANT_EXT = 'webp'
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'IMAGE_WORKERS', 2),
+    thread_name_prefix='recipe-images')
+
+
+def store_image(image):
+    """
+    Writes an uploaded image to the storage and returns its name,
+    so the file is saved before the database transaction starts.
+    Uploads are named after their content, so an image that is already
+    stored is reused instead of being saved again with a suffix.
+    """
+    name = Recipe._meta.get_field('image').generate_filename(None, image.name)
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, image)
+
+
+def variant_name(name, size):
+    """
+    Path of a variant of the stored image. Uploads are named after their
+    content, so the path changes whenever the image does.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{os.path.dirname(name)}/variants/{stem}_{size}.{VARIANT_EXT}'
+
+
+def open_original(name):
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    return image
+
+
+def render_variant(original, name, size):
+    """
+    Writes one variant unless it is already stored, returns its path.
+    """
+    path = variant_name(name, size)
+    if default_storage.exists(path):
+        return path
+    image = original.copy()
+    image.thumbnail((size, size))
+    buffer = BytesIO()
+    image.save(buffer, VARIANT_FORMAT)
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(buffer.getvalue()))
+    return path
+
+
+def generate_variants(name):
+    original = open_original(name)
+    for size in THUMBNAIL_SIZES:
+        render_variant(original, name, size)
+    bump_version('recipes')
+
+
+def run_generate_variants(name):
+    """
+    Job of the thread pool. Pool threads live as long as the process,
+    so the database connection is checked before and closed after the
+    job like Django does around a request, instead of being kept open
+    until the server drops it.
+    """
+    close_old_connections()
+    try:
+        generate_variants(name)
+    except Exception:
+        logger.exception('Could not generate variants of %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(name):
+    """
+    Generates the variants after commit, in the local thread pool or
+    with the IMAGE_TASK_RUNNER callable (e.g. a task queue) if set.
+    """
+    runner = getattr(settings, 'IMAGE_TASK_RUNNER', None)
+    if runner:
+        task = import_string(runner)
+        transaction.on_commit(lambda: task(name))
+    else:
+        transaction.on_commit(
+            lambda: executor.submit(run_generate_variants, name))
+
+
+def image_version(name):
+    return os.path.splitext(os.path.basename(name))[0]
+
+
+def get_thumbnail(name, size):
+    """
+    Path of the size x size thumbnail, rendered now if the variants
+    of the image have not been generated yet.
+    """
+    path = variant_name(name, size)
+    if default_storage.exists(path):
+        return path
+    return render_variant(open_original(name), name, size)
+
+
+def thumbnail_url(recipe, size, request=None):
+    """
+    Media URL of the thumbnail once it is generated, until then the URL
+    of the view that renders it, versioned with the image name.
+    Both change whenever the image changes.
+    """
+    path = variant_name(recipe.image.name, size)
+    if default_storage.exists(path):
+        url = default_storage.url(path)
+    else:
+        url = reverse('recipe_thumbnail', args=(recipe.id, size))
+        url = f'{url}?v={image_version(recipe.image.name)}'
+    return request.build_absolute_uri(url) if request else url
+
+
+def get_thumbnail_size(request, default):
+    if request is None:
+        return default
+    try:
+        size = int(request.query_params.get('image_size', default))
+    except ValueError:
+        return default
+    return size if size in THUMBNAIL_SIZES else default
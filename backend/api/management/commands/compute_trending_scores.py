@@ -0,0 +1,49 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import bump_version
+from api.models import Favorite, RecipeScore, ShoppingList
+
+EVENT_WEIGHTS = (
+    (Favorite, 1.0),
+    (ShoppingList, 1.0),
+)
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the time-decayed trending score of recipes from '
+            'favorites and shopping list additions. Run it periodically.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+        since = now - timedelta(days=settings.TRENDING_WINDOW_DAYS)
+        decay = math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+        scores = defaultdict(float)
+        for model, weight in EVENT_WEIGHTS:
+            events = model.objects.filter(
+                pub_date__gte=since
+            ).values_list('recipe_id', 'pub_date').order_by()
+            for recipe_id, pub_date in events.iterator(chunk_size=batch_size):
+                age = (now - pub_date).total_seconds()
+                scores[recipe_id] += weight * math.exp(-decay * age)
+
+        with transaction.atomic():
+            RecipeScore.objects.all().delete()
+            RecipeScore.objects.bulk_create(
+                (RecipeScore(recipe_id=recipe_id, score=score)
+                 for recipe_id, score in scores.items()),
+                batch_size=batch_size)
+        transaction.on_commit(lambda: bump_version('recipes'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {len(scores)} recipes'))
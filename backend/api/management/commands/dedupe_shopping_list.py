@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+
+from api.models import ShoppingList
+
+
+class Command(BaseCommand):
+    help = ('Deletes duplicate (user, recipe) shopping list rows, keeping '
+            'the oldest one. Run it before the migration adding the '
+            'unique_shopping_list constraint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report how many rows would be deleted.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        duplicates = ShoppingList.objects.order_by().values(
+            'user', 'recipe'
+        ).annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+        deleted = 0
+        for row in duplicates.iterator():
+            extra = ShoppingList.objects.filter(
+                user=row['user'], recipe=row['recipe']
+            ).exclude(id=row['keep'])
+            if options['dry_run']:
+                deleted += extra.count()
+            else:
+                deleted += extra.delete()[0]
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {deleted} duplicate shopping list rows'))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Renders the missing image variants of every recipe, e.g. for '
+            'images uploaded before the variants were introduced.')
+
+    def handle(self, *args, **options):
+        names = Recipe.objects.exclude(image='').order_by().values_list(
+            'image', flat=True).distinct()
+        done = failed = 0
+        for name in names.iterator():
+            try:
+                generate_variants(name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            else:
+                done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants of {done} images, {failed} failed'))
@@ -0,0 +1,145 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.cache import bump_version
+from api.catalog import ingredient_catalog
+from api.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_array(file):
+    """
+    Yields the objects of a top-level JSON array without loading
+    the whole file.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Expected a JSON array of ingredients')
+    position = 1
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Malformed JSON')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if not row or row == ['name', 'measurement_unit']:
+            continue
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def iter_batches(items, size):
+    """
+    Groups rows into batches deduplicated on name (the last one wins).
+    """
+    batch = {}
+    for item in items:
+        name = item['name'].strip()
+        if not name:
+            continue
+        batch[name] = item['measurement_unit'].strip()
+        if len(batch) >= size:
+            yield batch
+            batch = {}
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ('Loads ingredients from a JSON or CSV file, inserting new '
+            'names and updating the measurement unit of existing ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ingredients.json or .csv file')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Do not use COPY on PostgreSQL.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File {path} does not exist')
+        reader = iter_csv if path.endswith('.csv') else iter_json_array
+        use_copy = connection.vendor == 'postgresql' and not options['no_copy']
+        upsert = self.copy_upsert if use_copy else self.bulk_upsert
+
+        started = time.monotonic()
+        with open(path, encoding='utf-8', newline='') as file:
+            with transaction.atomic():
+                rows = upsert(
+                    iter_batches(reader(file), options['batch_size']))
+        transaction.on_commit(ingredient_catalog.invalidate)
+        transaction.on_commit(lambda: bump_version('recipes'))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {rows} ingredients in {elapsed:.2f}s '
+            f'({rows / max(elapsed, 1e-6):.0f} rows/s)'))
+
+    def bulk_upsert(self, batches):
+        rows = 0
+        for batch in batches:
+            existing = Ingredient.objects.in_bulk(
+                list(batch), field_name='name')
+            changed = []
+            for name, ingredient in existing.items():
+                if ingredient.measurement_unit != batch[name]:
+                    ingredient.measurement_unit = batch[name]
+                    changed.append(ingredient)
+            Ingredient.objects.bulk_update(changed, ['measurement_unit'])
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch.items() if name not in existing],
+                ignore_conflicts=True)
+            rows += len(batch)
+        return rows
+
+    def copy_upsert(self, batches):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        rows = 0
+        with connection.cursor() as cursor:
+            # ordinal keeps the file order, so DISTINCT ON below keeps
+            # the last row of a name, as iter_batches and bulk_upsert do.
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(ordinal bigserial, name varchar(200), '
+                'measurement_unit varchar(200)) '
+                'ON COMMIT DROP')
+            for batch in batches:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch.items())
+                buffer.seek(0)
+                cursor.copy_expert(
+                    'COPY ingredient_import (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    buffer)
+                rows += len(batch)
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT ON (name) name, measurement_unit '
+                'FROM ingredient_import ORDER BY name, ordinal DESC '
+                'ON CONFLICT (name) DO UPDATE '
+                'SET measurement_unit = EXCLUDED.measurement_unit')
+        return rows
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_version
+from api.models import Recipe
+from api.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the recipe search index, e.g. after loading recipes '
+            'in bulk or renaming ingredients.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.values_list('id', flat=True).order_by('id')
+        total = 0
+        for recipe_id in recipes.iterator(chunk_size=options['batch_size']):
+            update_search_index(recipe_id)
+            total += 1
+        bump_version('recipes')
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} recipes'))
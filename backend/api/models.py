@@ -1,5 +1,6 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
-from users.models import User
+from users.models import ProtectedFieldsMixin, User
 
 
 class Ingredient(models.Model):
@@ -44,7 +45,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class Recipe(ProtectedFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.PROTECT,
@@ -74,15 +75,82 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации')
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном')
+    shopping_list_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок')
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False)
+    protected_fields = ('favorites_count', 'shopping_list_count',
+                        'search_vector')
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
+        indexes = [
+            models.Index(fields=['pub_date', 'id'],
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=['favorites_count', 'id'],
+                         name='recipe_favorites_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class RecipeScore(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт')
+    score = models.FloatField(
+        db_index=True,
+        verbose_name='Рейтинг')
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата расчёта')
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.score:.2f}'
+
+
+class RecipeSearchTerm(models.Model):
+    """
+    Inverted index of the recipe search where PostgreSQL full-text
+    search is not available.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Рецепт')
+    term = models.CharField(
+        max_length=100,
+        verbose_name='Слово')
+    weight = models.FloatField(
+        verbose_name='Вес')
+
+    class Meta:
+        verbose_name = 'Слово поиска'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = [models.UniqueConstraint(
+            fields=['term', 'recipe'], name='unique_search_term')]
+
+    def __str__(self):
+        return f'{self.term} => {self.recipe}'
+
+
 class IngredientRecipe(models.Model):
     ingredient = models.ForeignKey(
         Ingredient,
@@ -120,6 +188,11 @@ class ShoppingList(models.Model):
 
     class Meta:
         verbose_name = 'Покупка'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_shopping_list'
+            )
+        ]
 
 
 class Favorite(models.Model):
@@ -169,3 +242,70 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} => {self.author}'
+
+
+class FeedItem(models.Model):
+    """
+    Inbox row: the recipe is shown in the feed of the user.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'recipe'], name='unique_feed_item')]
+
+    def __str__(self):
+        return f'{self.recipe} => {self.user}'
+
+
+class CacheVersion(models.Model):
+    """
+    Current version of a cache namespace, see api.cache.bump_version.
+    Stored in the database so that every process sees an invalidation
+    made in another one, e.g. by a management command.
+    """
+    namespace = models.CharField(
+        max_length=50,
+        primary_key=True,
+        verbose_name='Пространство имён')
+    version = models.CharField(
+        max_length=32,
+        verbose_name='Версия')
+
+    class Meta:
+        verbose_name = 'Версия кэша'
+        verbose_name_plural = 'Версии кэша'
+
+    def __str__(self):
+        return f'{self.namespace}: {self.version}'
+
+
+class RecipeIngredientChange(models.Model):
+    """
+    Recipe whose ingredients changed. Every process patches its
+    "what can I cook" index from these rows, see api.cook.
+    """
+    recipe_id = models.PositiveIntegerField(
+        verbose_name='Рецепт')
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата изменения')
+
+    class Meta:
+        verbose_name = 'Изменение ингредиентов рецепта'
+        verbose_name_plural = 'Изменения ингредиентов рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.created}'
@@ -1,5 +1,38 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPageNumberPaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class RecipeCursorPaginator(CursorPagination):
+    """
+    Keyset pagination for the recipe feed: no COUNT(*) and no OFFSET.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+
+
+class FollowCursorPaginator(CursorPagination):
+    ordering = ('-id',)
+    page_size_query_param = 'limit'
+
+
+class UserCursorPaginator(CursorPagination):
+    ordering = ('id',)
+    page_size_query_param = 'limit'
+
+
+class CursorPaginationMixin:
+    """
+    Switches the view to cursor_pagination_class on ?pagination=cursor,
+    the page-number pagination stays the default.
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if (not hasattr(self, '_paginator')
+                and self.request.query_params.get('pagination') == 'cursor'):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
@@ -0,0 +1,115 @@
+import csv
+import os
+from tempfile import SpooledTemporaryFile
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+
+FONT_NAME = 'DejaVuSans'
+FONT_PATH = os.path.join(
+    os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
+
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: returns the row instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    """
+    Base renderer for the shopping list download.
+    The list itself is streamed through stream(), render() is only
+    used by DRF for error responses.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data)
+
+    def stream(self, ingredients):
+        raise NotImplementedError
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        for item in ingredients:
+            yield (f"{item['ingredient__name']} "
+                   f"({item['ingredient__measurement_unit']}) - "
+                   f"{item['total']} \n")
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    header = ('name', 'measurement_unit', 'amount')
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.header)
+        for item in ingredients:
+            yield writer.writerow((item['ingredient__name'],
+                                   item['ingredient__measurement_unit'],
+                                   item['total']))
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    """
+    The list is laid out page by page into a spooled temporary file,
+    which is then streamed in chunks. The list holds one line per
+    ingredient, so the document stays small whatever the cart size.
+    DejaVu Sans is embedded for the Cyrillic names.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    title = 'Список покупок'
+    font_size = 12
+    line_height = 7 * mm
+    margin = 20 * mm
+    chunk_size = 64 * 1024
+
+    def stream(self, ingredients):
+        if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+        with SpooledTemporaryFile(max_size=1024 * 1024) as file:
+            self.draw(file, ingredients)
+            file.seek(0)
+            chunk = file.read(self.chunk_size)
+            while chunk:
+                yield chunk
+                chunk = file.read(self.chunk_size)
+
+    def draw(self, file, ingredients):
+        width, height = A4
+        pdf = canvas.Canvas(file, pagesize=A4)
+        pdf.setTitle(self.title)
+        y = height - self.margin
+        pdf.setFont(FONT_NAME, self.font_size + 4)
+        pdf.drawString(self.margin, y, self.title)
+        y -= 2 * self.line_height
+        pdf.setFont(FONT_NAME, self.font_size)
+        for item in ingredients:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(FONT_NAME, self.font_size)
+                y = height - self.margin
+            pdf.drawString(
+                self.margin, y,
+                f"{item['ingredient__name']} "
+                f"({item['ingredient__measurement_unit']}) - "
+                f"{item['total']}")
+            y -= self.line_height
+        pdf.save()
@@ -0,0 +1,90 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import (Count, F, FloatField, OuterRef, Subquery, Sum,
+                              TextField, Value)
+
+from .models import IngredientRecipe, Recipe, RecipeSearchTerm
+
+WORD = re.compile(r'\w+')
+
+# Weight of a word by the field it comes from, the same values
+# PostgreSQL uses for the A, B and C labels of SearchRank.
+FIELD_WEIGHTS = (
+    ('name', 'A', 1.0),
+    ('ingredients', 'B', 0.4),
+    ('text', 'C', 0.2),
+)
+
+
+def use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(text):
+    return WORD.findall(text.lower().replace('ё', 'е'))
+
+
+def ingredient_names(recipe_id):
+    return ' '.join(IngredientRecipe.objects.filter(
+        recipe_id=recipe_id
+    ).values_list('ingredient__name', flat=True))
+
+
+def update_search_index(recipe_id):
+    """
+    Rebuilds the search_vector column on PostgreSQL and the
+    RecipeSearchTerm rows of the recipe elsewhere.
+    """
+    fields = Recipe.objects.filter(
+        id=recipe_id).values('name', 'text').first()
+    if fields is None:
+        return
+    fields['ingredients'] = ingredient_names(recipe_id)
+    if use_postgres():
+        vector = None
+        for field, label, _ in FIELD_WEIGHTS:
+            part = SearchVector(
+                Value(fields[field], output_field=TextField()),
+                weight=label, config=settings.RECIPES_SEARCH_CONFIG)
+            vector = part if vector is None else vector + part
+        Recipe.objects.filter(id=recipe_id).update(search_vector=vector)
+        return
+    weights = Counter()
+    for field, _, weight in FIELD_WEIGHTS:
+        for term in tokenize(fields[field]):
+            weights[term[:100]] += weight
+    with transaction.atomic():
+        RecipeSearchTerm.objects.filter(recipe_id=recipe_id).delete()
+        RecipeSearchTerm.objects.bulk_create(
+            RecipeSearchTerm(recipe_id=recipe_id, term=term, weight=weight)
+            for term, weight in weights.items())
+
+
+def search_recipes(queryset, query):
+    """
+    Recipes matching every word of the query, annotated with
+    search_rank and ordered by it.
+    """
+    if use_postgres():
+        query = SearchQuery(
+            query, config=settings.RECIPES_SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date', '-id')
+    terms = {term[:100] for term in tokenize(query)}
+    if not terms:
+        return queryset.none()
+    matches = RecipeSearchTerm.objects.filter(
+        term__in=terms).order_by().values('recipe_id')
+    ranks = matches.filter(recipe_id=OuterRef('pk')).annotate(
+        total=Sum('weight')).values('total')
+    return queryset.filter(id__in=matches.annotate(
+        matched=Count('term')).filter(matched=len(terms)).values('recipe_id')
+    ).annotate(
+        search_rank=Subquery(ranks, output_field=FloatField())
+    ).order_by('-search_rank', '-pub_date', '-id')
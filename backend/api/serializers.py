@@ -1,11 +1,18 @@
+import os
+from collections import Counter
+
 from djoser.serializers import UserSerializer as BaseUserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from foodgram.settings import RECIPES_LIMIT
+from foodgram.settings import RECIPES_BATCH_LIMIT, RECIPES_LIMIT
 from users.models import User
 from django.db import transaction
-from .models import (Favorite, Follow, Ingredient,
-                     IngredientRecipe, Recipe, ShoppingList, Tag)
+from .cache import bump_version
+from .cook import recipe_ingredient_index
+from .fields import HashedBase64ImageField
+from .images import get_thumbnail_size, store_image, thumbnail_url
+from .models import Ingredient, IngredientRecipe, Recipe, Tag
+from .search import update_search_index
+from .state import get_request_state
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -40,10 +47,10 @@ class AuthorRecipeSerializer(serializers.ModelSerializer):
                   'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=request.user, author=obj).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_request_state(
+            self.context.get('request')).is_subscribed(obj)
 
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
@@ -70,30 +77,45 @@ class ListRecipeSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+    thumbnail_size = 640
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'thumbnail', 'text',
+                  'cooking_time')
+
+    def get_thumbnail(self, obj):
+        request = self.context.get('request')
+        size = get_thumbnail_size(request, self.thumbnail_size)
+        return thumbnail_url(obj, size, request)
 
     def get_ingredients(self, obj):
-        need_ingredients = IngredientRecipe.objects.filter(recipe=obj)
+        need_ingredients = obj.ingredientrecipe_set.all()
         return IngredientForRecipeSerializer(need_ingredients, many=True).data
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        user = request.user
-        return Favorite.objects.filter(recipe=obj, user=user).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return get_request_state(
+            self.context.get('request')).is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        user = request.user
-        return ShoppingList.objects.filter(recipe=obj, user=user).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return get_request_state(
+            self.context.get('request')).is_in_shopping_cart(obj)
+
+
+class CookRecipeSerializer(ListRecipeSerializer):
+    matched_count = serializers.IntegerField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+    class Meta(ListRecipeSerializer.Meta):
+        fields = ListRecipeSerializer.Meta.fields + (
+            'matched_count', 'missing_count')
 
 # Recipes - post
 
@@ -106,10 +128,8 @@ class UserSerializerModified(BaseUserSerializer):
                   'first_name', 'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return Follow.objects.filter(user=request.user, author=obj).exists()
+        return get_request_state(
+            self.context.get('request')).is_subscribed(obj)
 
 
 class ShowRecipeSerializer(serializers.ModelSerializer):
@@ -126,22 +146,17 @@ class ShowRecipeSerializer(serializers.ModelSerializer):
                   'name', 'image', 'text', 'cooking_time')
 
     def get_ingredients(self, obj):
-        qs = IngredientRecipe.objects.filter(recipe=obj)
+        qs = IngredientRecipe.objects.filter(
+            recipe=obj).select_related('ingredient')
         return IngredientForRecipeSerializer(qs, many=True).data
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        user = request.user
-        return Favorite.objects.filter(recipe=obj, user=user).exists()
+        return get_request_state(
+            self.context.get('request')).is_favorited(obj)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        user = request.user
-        return ShoppingList.objects.filter(recipe=obj, user=user).exists()
+        return get_request_state(
+            self.context.get('request')).is_in_shopping_cart(obj)
 
 
 class AddIngredientToRecipeSerializer(serializers.ModelSerializer):
@@ -158,7 +173,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True)
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = HashedBase64ImageField(max_length=None, use_url=True)
     author = UserSerializerModified(read_only=True)
 
     class Meta:
@@ -166,15 +181,34 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'tags', 'author', 'ingredients',
                   'name', 'image', 'text', 'cooking_time')
 
-    def validate(self, data):
-        ingredients = self.initial_data.get('ingredients')
-        for item in ingredients:
-            if int(item['amount']) < 0:
-                raise serializers.ValidationError(
-                    {'ingredients': (
-                        'The amount of the ingredient must be positive!')
-                     }
-                )
+    def validate_ingredients(self, data):
+        """
+        Resolves all ingredient ids with one query and stores the
+        Ingredient objects in the validated data.
+        """
+        if not data:
+            raise serializers.ValidationError(
+                'At least one ingredient is required!')
+        # A PATCH validates the nested items partially too, so the
+        # required fields are checked here.
+        if any('id' not in item or 'amount' not in item for item in data):
+            raise serializers.ValidationError(
+                'Every ingredient needs an id and an amount!')
+        ids = [item['id'] for item in data]
+        duplicates = {pk for pk, count in Counter(ids).items() if count > 1}
+        if duplicates:
+            raise serializers.ValidationError(
+                f'Duplicate ingredients: {sorted(duplicates)}')
+        if any(item['amount'] <= 0 for item in data):
+            raise serializers.ValidationError(
+                'The amount of the ingredient must be positive!')
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = set(ids) - set(ingredients)
+        if missing:
+            raise serializers.ValidationError(
+                f'Unknown ingredients: {sorted(missing)}')
+        for item in data:
+            item['ingredient'] = ingredients[item['id']]
         return data
 
     def validate_cooking_time(self, data):
@@ -184,47 +218,78 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             )
         return data
 
-    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
         author = self.context.get('request').user
-        recipe = Recipe.objects.create(
-            author=author, **validated_data)
-        recipe.save()
-        recipe.tags.set(tags_data)
-
-        ingredient_recipes = [IngredientRecipe(
-            ingredient=Ingredient.objects.get(id=ingredient['id']),
-            recipe=recipe,
-            amount=ingredient['amount']) for ingredient in ingredients_data]
-        IngredientRecipe.objects.bulk_create(ingredient_recipes)
-
+        validated_data['image'] = store_image(validated_data['image'])
+        with transaction.atomic():
+            recipe = Recipe.objects.create(
+                author=author, **validated_data)
+            recipe.tags.set(tags_data)
+
+            ingredient_recipes = [IngredientRecipe(
+                ingredient=ingredient['ingredient'],
+                recipe=recipe,
+                amount=ingredient['amount'])
+                for ingredient in ingredients_data]
+            IngredientRecipe.objects.bulk_create(ingredient_recipes)
+            recipe_ingredient_index.changed(recipe.id)
         return recipe
 
-    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredient_data = validated_data.pop('ingredients')
-        tags_data = validated_data.pop('tags')
-
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-
-        ingredient_recipes = [IngredientRecipe(
-            ingredient=Ingredient.objects.get(id=ingredient['id']),
-            recipe=instance,
-            amount=ingredient['amount']) for ingredient in ingredient_data]
-        IngredientRecipe.objects.bulk_create(ingredient_recipes)
-
-        instance.name = validated_data.pop('name')
-        instance.text = validated_data.pop('text')
-
-        if validated_data.get('image') is not None:
-            instance.image = validated_data.pop('image')
-        instance.cooking_time = validated_data.pop('cooking_time')
-        instance.save()
-        instance.tags.set(tags_data)
+        ingredients_data = validated_data.pop('ingredients', None)
+        tags_data = validated_data.pop('tags', None)
+        image = validated_data.pop('image', None)
+        if (image is not None
+                and os.path.basename(instance.image.name) != image.name):
+            validated_data['image'] = store_image(image)
+
+        changed = [field for field, value in validated_data.items()
+                   if getattr(instance, field) != value]
+        with transaction.atomic():
+            for field in changed:
+                setattr(instance, field, validated_data[field])
+            if changed:
+                instance.save(update_fields=changed)
+            if tags_data is not None:
+                instance.tags.set(tags_data)
+            if ingredients_data is not None:
+                self.update_ingredients(instance, ingredients_data)
         return instance
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """
+        Inserts, updates and deletes only the rows that differ.
+        """
+        current = {
+            row.ingredient_id: row
+            for row in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        to_create, to_update = [], []
+        for item in ingredients_data:
+            row = current.pop(item['ingredient'].id, None)
+            if row is None:
+                to_create.append(IngredientRecipe(
+                    ingredient=item['ingredient'],
+                    recipe=recipe,
+                    amount=item['amount']))
+            elif row.amount != item['amount']:
+                row.amount = item['amount']
+                to_update.append(row)
+        if current:
+            IngredientRecipe.objects.filter(
+                id__in=[row.id for row in current.values()]).delete()
+        if to_update:
+            IngredientRecipe.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            IngredientRecipe.objects.bulk_create(to_create)
+        if to_create or to_update:
+            transaction.on_commit(lambda: bump_version('recipes'))
+        if to_create or current:
+            transaction.on_commit(lambda: update_search_index(recipe.id))
+            recipe_ingredient_index.changed(recipe.id)
+
     def to_representation(self, instance):
         return ShowRecipeSerializer(
             instance,
@@ -238,10 +303,13 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
 
 class ShowRecipeAddedSerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    thumbnail = serializers.SerializerMethodField()
+    thumbnail_size = 320
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnail',
+                  'cooking_time')
         read_only_fields = fields
 
     def get_image(self, obj):
@@ -249,30 +317,48 @@ class ShowRecipeAddedSerializer(serializers.ModelSerializer):
         img_url = obj.image.url
         return request.build_absolute_uri(img_url)
 
-
-class FavoriteSerializer(serializers.ModelSerializer):
-    recipe = serializers.PrimaryKeyRelatedField(queryset=Recipe.objects.all())
-    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
-
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
-
-    def to_representation(self, instance):
+    def get_thumbnail(self, obj):
         request = self.context.get('request')
-        return ShowRecipeAddedSerializer(
-            instance.recipe,
-            context={'request': request}
-        ).data
+        size = get_thumbnail_size(request, self.thumbnail_size)
+        return thumbnail_url(obj, size, request)
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    """
+    Recipe ids to add to and to remove from the favorites or the
+    shopping cart in one request.
+    """
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=RECIPES_BATCH_LIMIT)
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=RECIPES_BATCH_LIMIT)
 
+    def validate(self, data):
+        if not data.get('add') and not data.get('remove'):
+            raise serializers.ValidationError(
+                'Pass recipe ids to add or to remove!')
+        return data
 
-class ShoppingListSerializer(FavoriteSerializer):
 
-    class Meta(FavoriteSerializer.Meta):
-        model = ShoppingList
+# Follow
 
 
-# Follow
+def get_recipes_limit(request):
+    """
+    Number of recipes shown for every author, ?recipes_limit= or
+    RECIPES_LIMIT by default.
+    """
+    if request is None:
+        return RECIPES_LIMIT
+    try:
+        limit = int(request.query_params.get('recipes_limit', RECIPES_LIMIT))
+    except ValueError:
+        return RECIPES_LIMIT
+    return max(limit, 0)
 
 
 class ShowFollowSerializer(serializers.ModelSerializer):
@@ -287,14 +373,17 @@ class ShowFollowSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, obj):
-        request = self.context.get('request')
-        if request is None or request.user.is_anonymous:
-            return False
-        return obj.follower.filter(user=obj, author=request.user).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_request_state(
+            self.context.get('request')).is_subscribed(obj)
 
     def get_recipes(self, obj):
-        recipes = obj.recipes.all()[:RECIPES_LIMIT]
         request = self.context.get('request')
+        if hasattr(obj, 'recent_recipes'):
+            recipes = obj.recent_recipes
+        else:
+            recipes = obj.recipes.all()[:get_recipes_limit(request)]
         return ShowRecipeAddedSerializer(
             recipes,
             many=True,
@@ -302,39 +391,4 @@ class ShowFollowSerializer(serializers.ModelSerializer):
         ).data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
-
-class FollowSerializer(serializers.ModelSerializer):
-
-    queryset = User.objects.all()
-    user = serializers.PrimaryKeyRelatedField(queryset=queryset)
-    author = serializers.PrimaryKeyRelatedField(queryset=queryset)
-
-    class Meta:
-        model = Follow
-        fields = (
-            'user',
-            'author'
-        )
-
-    def validate(self, data):
-        user = self.context.get('request').user
-        author_id = data['author'].id
-        follow_exist = Follow.objects.filter(
-            user=user,
-            author__id=author_id
-        ).exists()
-
-        if self.context.get('request').method == 'GET':
-            if user.id == author_id or follow_exist:
-                raise serializers.ValidationError(
-                    'You already had followed this user')
-        return data
-
-    def to_representation(self, instance):
-        request = self.context.get('request')
-        context = {'request': request}
-        return ShowFollowSerializer(
-            instance.author,
-            context=context).data
+        return obj.recipes_count
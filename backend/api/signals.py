@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import User
+from .cache import bump_version
+from .catalog import ingredient_catalog
+from .cook import recipe_ingredient_index
+from .feed import backfill, fan_out, refill, remove
+from .images import schedule_variants
+from .models import (Favorite, Follow, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingList, Tag)
+from .search import update_search_index
+from .state import invalidate_user_state
+
+INGREDIENT_TRIGRAM_INDEX = (
+    'CREATE INDEX IF NOT EXISTS api_ingredient_name_trgm '
+    'ON api_ingredient USING gin (UPPER("name"::text) gin_trgm_ops)'
+)
+RECIPE_SEARCH_INDEX = (
+    'CREATE INDEX IF NOT EXISTS api_recipe_search_vector '
+    'ON api_recipe USING gin (search_vector)'
+)
+
+# Counted model: (model holding the counter, foreign key, counter field).
+COUNTER_FIELDS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingList: (Recipe, 'recipe_id', 'shopping_list_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Follow: (User, 'author_id', 'followers_count'),
+}
+
+
+def create_search_indexes(sender, **kwargs):
+    """
+    Trigram index for the ingredient search on PostgreSQL.
+    It matches the UPPER(...) LIKE expression Django builds for
+    istartswith/icontains, so both prefix and substring lookups use it.
+    GIN index on the tsvector column of the recipe search.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(INGREDIENT_TRIGRAM_INDEX)
+        cursor.execute(RECIPE_SEARCH_INDEX)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_catalog(sender, **kwargs):
+    """
+    After commit, so a concurrent reload cannot store the old rows
+    under the new version.
+    """
+    transaction.on_commit(ingredient_catalog.invalidate)
+    transaction.on_commit(lambda: bump_version('recipes'))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tags_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('tags'))
+    transaction.on_commit(lambda: bump_version('recipes'))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=IngredientRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('recipes'))
+
+
+@receiver([post_save, post_delete], sender=IngredientRecipe)
+def invalidate_recipe_ingredient_index(sender, instance, **kwargs):
+    recipe_ingredient_index.changed(instance.recipe_id)
+
+
+@receiver([post_save, post_delete], sender=IngredientRecipe)
+def index_recipe_ingredients(sender, instance, **kwargs):
+    if set(kwargs.get('update_fields') or ()) == {'amount'}:
+        return
+    transaction.on_commit(lambda: update_search_index(instance.recipe_id))
+
+
+@receiver(post_save, sender=Recipe)
+def generate_image_variants(sender, instance, created, update_fields,
+                            **kwargs):
+    """
+    Covers every way of saving a recipe, the API and the admin.
+    Variants that already exist are not rendered again.
+    """
+    if not created and update_fields is not None and (
+            'image' not in update_fields):
+        return
+    if instance.image:
+        schedule_variants(instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and not {'name', 'text'} & set(update_fields):
+        return
+    transaction.on_commit(lambda: update_search_index(instance.id))
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipes_cache_on_author_change(sender, instance, created,
+                                              update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is not None and set(update_fields) <= {
+            'last_login', *(field for model, _, field
+                            in COUNTER_FIELDS.values() if model is User)}:
+        return
+    if not Recipe.objects.filter(author_id=instance.id).exists():
+        return
+    transaction.on_commit(lambda: bump_version('recipes'))
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingList)
+@receiver([post_save, post_delete], sender=Follow)
+def invalidate_user_state_cache(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_user_state(instance.user_id))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def increment_counters(sender, instance, created, **kwargs):
+    if created:
+        update_counter(sender, instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def decrement_counters(sender, instance, **kwargs):
+    update_counter(sender, instance, -1)
+
+
+def update_counter(sender, instance, delta):
+    """
+    Keeps the COUNTER_FIELDS in step with the rows, see recount_counters.
+    """
+    key = COUNTER_FIELDS[sender][1]
+    update_counters(sender, [getattr(instance, key)], delta)
+
+
+def update_counters(sender, ids, delta):
+    """
+    Moves the counter of every id at once, bulk writes of the counted
+    rows send no signals and call it themselves. A counter never goes
+    below zero, so a row that was not counted (e.g. created before the
+    counters, see recount_counters) can still be deleted.
+    """
+    model, _, field = COUNTER_FIELDS[sender]
+    model.objects.filter(id__in=ids).update(
+        **{field: Greatest(F(field) + delta, 0)})
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: fan_out(instance))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: backfill(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def clear_feed(sender, instance, **kwargs):
+    remove(instance)
+    # decrement_counters has already run, the counter includes this
+    # delete. The UPDATE locks the author row, so exactly one
+    # transaction sees the count drop back to the limit.
+    followers_count = User.objects.filter(
+        id=instance.author_id).values_list('followers_count', flat=True)
+    if followers_count.first() == settings.FEED_FANOUT_LIMIT:
+        transaction.on_commit(lambda: refill(instance.author_id))
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+
+from .cache import bump_version, get_version
+from .models import Favorite, Follow, ShoppingList
+
+
+def state_namespace(user_id):
+    return f'user_state:{user_id}'
+
+
+def invalidate_user_state(user_id):
+    """
+    Bumps the version of the user's cached sets. It is kept in the
+    database like the other cache versions, so every process drops
+    them, whichever process made the write.
+    """
+    bump_version(state_namespace(user_id))
+
+
+class UserState:
+    """
+    Authors followed by the request user and recipes in their favorites
+    and shopping cart. Each set is read from the cache, or loaded by one
+    query and cached, on first use and kept for the rest of the request.
+    The cache keys carry the user's version from invalidate_user_state.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    @property
+    def is_anonymous(self):
+        return self.user is None or self.user.is_anonymous
+
+    def _ids(self, name, model, field):
+        if self.is_anonymous:
+            return frozenset()
+        namespace = state_namespace(self.user.id)
+        key = f'{namespace}:{get_version(namespace)}:{name}'
+        ids = cache.get(key)
+        if ids is None:
+            ids = frozenset(model.objects.filter(
+                user=self.user).values_list(field, flat=True))
+            cache.set(key, ids, settings.USER_STATE_TIMEOUT)
+        return ids
+
+    @cached_property
+    def following(self):
+        return self._ids('following', Follow, 'author_id')
+
+    @cached_property
+    def favorites(self):
+        return self._ids('favorites', Favorite, 'recipe_id')
+
+    @cached_property
+    def shopping_cart(self):
+        return self._ids('shopping_cart', ShoppingList, 'recipe_id')
+
+    def is_subscribed(self, author):
+        return author.id in self.following
+
+    def is_favorited(self, recipe):
+        return recipe.id in self.favorites
+
+    def is_in_shopping_cart(self, recipe):
+        return recipe.id in self.shopping_cart
+
+
+def get_request_state(request):
+    """
+    The UserState of the request, created on first use.
+    """
+    if request is None:
+        return UserState(None)
+    state = getattr(request, '_user_state', None)
+    if state is None or state.user is not request.user:
+        state = UserState(request.user)
+        request._user_state = state
+    return state
@@ -0,0 +1,91 @@
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .signals import update_counters
+from .state import invalidate_user_state
+
+
+def add_relation(model, **values):
+    """
+    INSERT ... ON CONFLICT DO NOTHING of one row, the unique constraint
+    of the model makes a repeated or concurrent call a no-op.
+    Returns True if the row was inserted, then post_save is sent
+    as for a regular save, so the counters, the cached user state and
+    the feed are kept in step by the receivers in signals.
+    """
+    opts = model._meta
+    using = router.db_for_write(model)
+    connection = connections[using]
+    instance = model(**values)
+    for field in opts.concrete_fields:
+        if getattr(field, 'auto_now_add', False):
+            setattr(instance, field.attname, timezone.now())
+    fields = [field for field in opts.concrete_fields
+              if not field.primary_key]
+    columns = ', '.join(connection.ops.quote_name(field.column)
+                        for field in fields)
+    params = [field.get_db_prep_save(getattr(instance, field.attname),
+                                     connection)
+              for field in fields]
+    placeholders = ', '.join(['%s'] * len(fields))
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {connection.ops.quote_name(opts.db_table)} '
+                f'({columns}) VALUES ({placeholders}) ON CONFLICT DO NOTHING',
+                params)
+            created = cursor.rowcount == 1
+        if created:
+            post_save.send(
+                sender=model, instance=instance, created=True,
+                update_fields=None, raw=False, using=using)
+    return created
+
+
+def remove_relation(model, **values):
+    """
+    DELETE of the one row matching the values, without the collector
+    and its SELECT. Returns True if the row was there, then post_delete
+    is sent with an unsaved instance built from the values; the
+    receivers only read its foreign keys.
+    """
+    using = router.db_for_write(model)
+    with transaction.atomic(using=using):
+        deleted = model.objects.using(using).filter(
+            **values)._raw_delete(using)
+        if deleted:
+            post_delete.send(
+                sender=model, instance=model(**values), using=using)
+    return deleted > 0
+
+
+def toggle_recipes(model, user, to_add, to_remove):
+    """
+    Adds and then removes recipes of the favorites or the shopping cart
+    of the user in one transaction, returns the ids that were added and
+    removed: one INSERT ... ON CONFLICT DO NOTHING and one DELETE, which
+    send no signals, so the counters and the cached user state are
+    updated here. The ids are taken from the rows read first, a toggle
+    of the same recipe racing with the batch may move its counter by
+    one too many; recount_counters fixes it.
+    """
+    with transaction.atomic():
+        existing = set(model.objects.filter(
+            user=user, recipe_id__in=to_add + to_remove
+        ).values_list('recipe_id', flat=True))
+        added = [pk for pk in to_add if pk not in existing]
+        if added:
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=pk) for pk in added],
+                ignore_conflicts=True)
+            update_counters(model, added, 1)
+        existing.update(added)
+        removed = [pk for pk in to_remove if pk in existing]
+        if removed:
+            model.objects.filter(user=user, recipe_id__in=removed)._raw_delete(
+                router.db_for_write(model))
+            update_counters(model, removed, -1)
+        if added or removed:
+            transaction.on_commit(lambda: invalidate_user_state(user.id))
+    return added, removed
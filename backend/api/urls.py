@@ -2,7 +2,9 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (IngredientViewSet, TagViewSet, RecipesViewSet,
                     download_shopping_cart, ShoppingListViewSet,
-                    FavoriteViewSet, FollowViewSet, ListFollowViewSet)
+                    FavoriteViewSet, FollowViewSet, ListFollowViewSet,
+                    RecipeBatchViewSet, recipe_thumbnail)
+from .models import Favorite, ShoppingList
 
 
 router = DefaultRouter()
@@ -28,11 +30,26 @@ urlpatterns = [
         download_shopping_cart,
         name='download'
     ),
+    path(
+        'recipes/shopping_cart/batch/',
+        RecipeBatchViewSet.as_view(model=ShoppingList),
+        name='shopping_cart_batch'
+    ),
+    path(
+        'recipes/favorite/batch/',
+        RecipeBatchViewSet.as_view(model=Favorite),
+        name='favorite_batch'
+    ),
     path(
         'recipes/<int:recipe_id>/shopping_cart/',
         ShoppingListViewSet.as_view(),
         name='shopping_cart'
     ),
+    path(
+        'recipes/<int:recipe_id>/thumbnail/<int:size>/',
+        recipe_thumbnail,
+        name='recipe_thumbnail'
+    ),
     path(
         'recipes/<int:recipe_id>/favorite/',
         FavoriteViewSet.as_view(),
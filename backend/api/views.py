@@ -1,23 +1,46 @@
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view
+from django.db.models import (BooleanField, Case, F, IntegerField, OuterRef,
+                              Prefetch, Subquery, Sum, Value, When)
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.views.decorators.http import require_GET
+from rest_framework.decorators import action, api_view, renderer_classes
 from rest_framework import status, viewsets, generics
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from .cache import CachedResponseMixin, get_version
+from .catalog import ingredient_catalog
+from .cook import recipe_ingredient_index
+from .feed import feed_queryset
 from .filters import RecipeFilter, IngredientNameFilter
+from .images import (THUMBNAIL_SIZES, get_thumbnail, image_version,
+                     thumbnail_url)
 from .permissions import AdminOrAuthorOrReadOnly
 from .models import (Ingredient, Tag, Recipe, ShoppingList, IngredientRecipe,
                      Favorite, Follow)
 from .serializers import (IngredientSerializer, TagSerializer,
                           ListRecipeSerializer, CreateRecipeSerializer,
-                          ShoppingListSerializer, FavoriteSerializer,
-                          FollowSerializer, ShowFollowSerializer)
+                          CookRecipeSerializer, ShowRecipeAddedSerializer,
+                          ShowFollowSerializer, RecipeBatchSerializer,
+                          get_recipes_limit)
+from foodgram.settings import INGREDIENTS_SEARCH_LIMIT
 from users.models import User
-from .paginators import CustomPageNumberPaginator
+from .paginators import (CursorPaginationMixin, CustomPageNumberPaginator,
+                         FollowCursorPaginator, RecipeCursorPaginator)
+from .renderers import (ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                        ShoppingListTextRenderer)
+from .state import get_request_state
+from .toggles import add_relation, remove_relation, toggle_recipes
 
+# Columns read by ShowRecipeAddedSerializer and ShowFollowSerializer.
+RECIPE_PROJECTION = ('id', 'name', 'image', 'cooking_time')
+AUTHOR_PROJECTION = ('id', 'email', 'username', 'first_name', 'last_name',
+                     'recipes_count')
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngredientViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     Used to list Ingredients.
     """
@@ -26,9 +49,56 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (AllowAny, )
     pagination_class = None
     filterset_class = IngredientNameFilter
+    cache_namespace = 'ingredients'
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            self.list_ingredients, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def list_ingredients(self, request, *args, **kwargs):
+        params = set(request.query_params)
+        name = request.query_params.get('name', '')
+        search = self.get_search()
+        if not params:
+            return Response(ingredient_catalog.all())
+        if params == {'name'}:
+            return Response(ingredient_catalog.startswith(name))
+        if params == {'search'} and search is not None:
+            return Response(ingredient_catalog.search(
+                search, INGREDIENTS_SEARCH_LIMIT))
+        return super().list(request, *args, **kwargs)
+
+    def get_search(self):
+        if self.action != 'list':
+            return None
+        return self.request.query_params.get('search', '').strip() or None
+
+    def get_queryset(self):
+        search = self.get_search()
+        if search is None:
+            return Ingredient.objects.all()
+        # Prefix matches go first, then the rest of substring matches.
+        return Ingredient.objects.filter(
+            name__icontains=search
+        ).annotate(
+            rank=Case(
+                When(name__istartswith=search, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField())
+        ).order_by('rank', 'name')
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_search() is not None:
+            return queryset[:INGREDIENTS_SEARCH_LIMIT]
+        return queryset
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+class TagViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     Used to list tags.
     """
@@ -36,9 +106,17 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = TagSerializer
     permission_classes = (AllowAny, )
     pagination_class = None
+    cache_namespace = 'tags'
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
 
 
-class RecipesViewSet(viewsets.ModelViewSet):
+class RecipesViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     """
     View with post, delete, put options.
     Used to post, delete, put recipes.
@@ -47,6 +125,124 @@ class RecipesViewSet(viewsets.ModelViewSet):
     filter_class = RecipeFilter
     permission_classes = [AdminOrAuthorOrReadOnly, ]
     pagination_class = CustomPageNumberPaginator
+    cursor_pagination_class = RecipeCursorPaginator
+    user_filters = ('is_favorited', 'is_in_shopping_cart')
+    user_flags = True
+
+    def list(self, request, *args, **kwargs):
+        """
+        Pages are cached without the per-user flags, which are then
+        overlaid from the UserState of the request.
+        """
+        error = self.check_cursor_ordering(
+            request.query_params.get('pagination') == 'cursor')
+        if error is not None:
+            return error
+        if any(request.query_params.get(name) for name in self.user_filters):
+            return super().list(request, *args, **kwargs)
+        version = get_version('recipes')
+        key = f'recipes:{version}:{request.build_absolute_uri()}'
+        data = cache.get(key)
+        if data is None:
+            self.user_flags = False
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data)
+        state = get_request_state(request)
+        if not state.is_anonymous:
+            for recipe in data['results']:
+                recipe['is_favorited'] = recipe['id'] in state.favorites
+                recipe['is_in_shopping_cart'] = (
+                    recipe['id'] in state.shopping_cart)
+                recipe['author']['is_subscribed'] = (
+                    recipe['author']['id'] in state.following)
+        return Response(data)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        """
+        Recipes of the followed authors, cursor-paginated.
+        """
+        error = self.check_cursor_ordering(True)
+        if error is not None:
+            return error
+        queryset = self.filter_queryset(
+            feed_queryset(request.user, self.get_queryset()))
+        paginator = RecipeCursorPaginator()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def cook(self, request):
+        """
+        Recipes that use the given ingredients and lack at most
+        max_missing others, the best covered recipes first.
+        """
+        try:
+            ingredient_ids = [
+                int(pk) for pk in request.query_params.getlist('ingredients')]
+            max_missing = int(request.query_params.get('max_missing', 0))
+        except ValueError:
+            ingredient_ids, max_missing = None, -1
+        if not ingredient_ids or max_missing < 0:
+            return Response(
+                {"Error": "Pass ingredient ids and a non-negative "
+                          "max_missing"},
+                status=status.HTTP_400_BAD_REQUEST)
+        matches = recipe_ingredient_index.match(ingredient_ids, max_missing)
+        paginator = CustomPageNumberPaginator()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page])
+        results = []
+        for recipe_id, matched, missing in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.matched_count, recipe.missing_count = matched, missing
+            results.append(recipe)
+        serializer = CookRecipeSerializer(
+            results, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+    def get_queryset(self):
+        """
+        The per-user flags come from the request UserState, pages cached
+        for everyone are built with the flags set to False instead.
+        """
+        recipes, authors = Recipe.objects.all(), User.objects.all()
+        if not self.user_flags:
+            false = Value(False, output_field=BooleanField())
+            recipes = recipes.annotate(
+                is_favorited=false, is_in_shopping_cart=false)
+            authors = authors.annotate(is_subscribed=false)
+        ingredients = IngredientRecipe.objects.select_related('ingredient')
+        return recipes.prefetch_related(
+            Prefetch('author', queryset=authors),
+            Prefetch('ingredientrecipe_set', queryset=ingredients),
+            'tags',
+        ).order_by(*self.get_ordering())
+
+    def check_cursor_ordering(self, cursor):
+        """
+        Cursor pages always follow RecipeCursorPaginator.ordering,
+        ?ordering= is rejected rather than ignored.
+        """
+        if cursor and self.request.query_params.get('ordering'):
+            return Response(
+                {"Error": "ordering is not supported with cursor "
+                          "pagination"},
+                status=status.HTTP_400_BAD_REQUEST)
+        return None
+
+    def get_ordering(self):
+        ordering = self.request.query_params.get('ordering')
+        if ordering == 'popular':
+            return ('-favorites_count', '-pub_date', '-id')
+        if ordering == 'trending':
+            return (F('score__score').desc(nulls_last=True),
+                    '-pub_date', '-id')
+        return ('-pub_date', '-id')
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -68,65 +264,73 @@ class ShoppingListViewSet(APIView):
     permission_classes = [IsAuthenticated, ]
 
     def get(self, request, recipe_id):
-        user = request.user
-        data = {
-            "user": user.id,
-            "recipe": recipe_id,
-        }
-        shopping_cart_exist = ShoppingList.objects.filter(
-            user=user,
-            recipe__id=recipe_id
-        ).exists()
-        if shopping_cart_exist:
-            return Response(
-                {"Error": "This recipe is already in your basket"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        context = {'request': request}
-        serializer = ShoppingListSerializer(data=data, context=context)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return add_recipe_to(ShoppingList, request, recipe_id)
 
     def delete(self, request, recipe_id):
-        user = request.user
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        if not ShoppingList.objects.filter(user=user, recipe=recipe).exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        ShoppingList.objects.get(user=user, recipe=recipe).delete()
+        remove_relation(
+            ShoppingList, user=request.user, recipe_id=recipe_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def add_recipe_to(model, request, recipe_id):
+    """
+    Adds the recipe to the favorites or the shopping cart of the user.
+    Repeating it is a no-op answered with 200 instead of 201.
+    """
+    recipe = get_object_or_404(
+        Recipe.objects.only(*RECIPE_PROJECTION), id=recipe_id)
+    created = add_relation(model, user=request.user, recipe=recipe)
+    serializer = ShowRecipeAddedSerializer(
+        recipe, context={'request': request})
+    return Response(
+        serializer.data,
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
 @api_view(['GET'])
+@renderer_classes([ShoppingListTextRenderer, ShoppingListCSVRenderer,
+                   ShoppingListPDFRenderer])
 def download_shopping_cart(request):
     """
     Function to download ingredients for recipes in shopping list.
+    The file format is chosen with the ?format= parameter
+    (txt, csv or pdf).
     """
 
-    user = request.user
-    shopping_cart = user.shopping_list.all()
-    buying_list = {}
-    for record in shopping_cart:
-        recipe = record.recipe
-        ingredients = IngredientRecipe.objects.filter(recipe=recipe)
-        for ingredient in ingredients:
-            amount = ingredient.amount
-            name = ingredient.ingredient.name
-            measurement_unit = ingredient.ingredient.measurement_unit
-            if name not in buying_list:
-                buying_list[name] = {
-                    'measurement_unit': measurement_unit,
-                    'amount': amount
-                }
-            else:
-                buying_list[name]['amount'] = (buying_list[name]['amount']
-                                               + amount)
-    wishlist = []
-    for name, data in buying_list.items():
-        wishlist.append(
-            f"{name} ({data['measurement_unit']}) - {data['amount']} \n")
-    response = HttpResponse(wishlist, content_type='text/plain')
-    response['Content-Disposition'] = 'attachment; filename="ShoppingList.txt"'
+    ingredients = IngredientRecipe.objects.filter(
+        recipe__shopping_list__user=request.user
+    ).values(
+        'ingredient__name', 'ingredient__measurement_unit'
+    ).annotate(
+        total=Sum('amount')
+    ).order_by('ingredient__name')
+    renderer = request.accepted_renderer
+    content_type = renderer.media_type
+    if renderer.charset:
+        content_type = f'{content_type}; charset={renderer.charset}'
+    response = StreamingHttpResponse(
+        renderer.stream(ingredients.iterator()), content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="ShoppingList.{renderer.format}"')
+    return response
+
+
+@require_GET
+def recipe_thumbnail(request, recipe_id, size):
+    """
+    Renders the recipe image thumbnail on demand.
+    The URL carries the image version, so the response is immutable.
+    A missing or outdated version is redirected to the current URL.
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise Http404
+    recipe = get_object_or_404(Recipe.objects.only('image'), id=recipe_id)
+    if request.GET.get('v') != image_version(recipe.image.name):
+        return redirect(thumbnail_url(recipe, size))
+    path = get_thumbnail(recipe.image.name, size)
+    response = FileResponse(default_storage.open(path),
+                            content_type='image/webp')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
     return response
 
 
@@ -139,33 +343,49 @@ class FavoriteViewSet(APIView):
     permission_classes = [IsAuthenticated, ]
 
     def get(self, request, recipe_id):
-        user = request.user
-        data = {
-            "user": user.id,
-            "recipe": recipe_id,
-        }
-        if Favorite.objects.filter(user=user, recipe__id=recipe_id).exists():
-            return Response(
-                {"Error": "You have already added recipe in favorite list"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        serializer = FavoriteSerializer(
-            data=data,
-            context={"request": request}
-        )
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return add_recipe_to(Favorite, request, recipe_id)
 
     def delete(self, request, recipe_id):
-        user = request.user
-        recipe = get_object_or_404(Recipe, id=recipe_id)
-        if not Favorite.objects.filter(user=user, recipe=recipe).exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-        Favorite.objects.get(user=user, recipe=recipe).delete()
+        remove_relation(Favorite, user=request.user, recipe_id=recipe_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class RecipeBatchViewSet(APIView):
+    """
+    View with post option.
+    Used to add and remove many recipes of the favorite list or
+    the shopping list at once, model is set in urls.
+    """
+    permission_classes = [IsAuthenticated, ]
+    model = None
+
+    def post(self, request):
+        serializer = RecipeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        to_add = list(dict.fromkeys(serializer.validated_data.get('add', [])))
+        to_remove = list(dict.fromkeys(
+            serializer.validated_data.get('remove', [])))
+        recipes = Recipe.objects.only('id').in_bulk(to_add + to_remove)
+        added, removed = map(set, toggle_recipes(
+            self.model, request.user,
+            [pk for pk in to_add if pk in recipes],
+            [pk for pk in to_remove if pk in recipes]))
+        results = []
+        for pk in to_add:
+            if pk not in recipes:
+                result = 'not_found'
+            else:
+                result = 'added' if pk in added else 'exists'
+            results.append({'id': pk, 'action': 'add', 'result': result})
+        for pk in to_remove:
+            if pk not in recipes:
+                result = 'not_found'
+            else:
+                result = 'removed' if pk in removed else 'absent'
+            results.append({'id': pk, 'action': 'remove', 'result': result})
+        return Response({'results': results})
+
+
 class FollowViewSet(APIView):
     """
     View with post and delete options.
@@ -175,37 +395,39 @@ class FollowViewSet(APIView):
 
     def get(self, request, author_id):
         user = request.user
-        follow_exist = Follow.objects.filter(
-            user=user,
-            author__id=author_id
-        ).exists()
-        if user.id == author_id or follow_exist:
+        if user.id == author_id:
             return Response(
-                {"Error": "You have already followed this person"},
+                {"Error": "You can not follow yourself"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        data = {
-            'user': user.id,
-            'author': author_id
-        }
-        serializer = FollowSerializer(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        author = get_object_or_404(
+            User.objects.only(*AUTHOR_PROJECTION), id=author_id)
+        created = add_relation(Follow, user=user, author=author)
+        author.is_subscribed = True
+        author.recent_recipes = Recipe.objects.filter(
+            author=author
+        ).only(*RECIPE_PROJECTION).order_by(
+            '-pub_date', '-id')[:get_recipes_limit(request)]
+        serializer = ShowFollowSerializer(
+            author, context={'request': request})
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
 
     def delete(self, request, author_id):
-        obj = get_object_or_404(Follow, user=request.user, author=author_id)
-        obj.delete()
+        remove_relation(Follow, user=request.user, author_id=author_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ListFollowViewSet(generics.ListAPIView):
+class ListFollowViewSet(CursorPaginationMixin, generics.ListAPIView):
     """
     View with post and delete options.
     Used to list Follow objects.
     """
     permission_classes = [IsAuthenticated, ]
     serializer_class = ShowFollowSerializer
+    pagination_class = CustomPageNumberPaginator
+    cursor_pagination_class = FollowCursorPaginator
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -214,4 +436,17 @@ class ListFollowViewSet(generics.ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return User.objects.filter(following__user=user)
+        limit = get_recipes_limit(self.request)
+        latest = Recipe.objects.filter(
+            author=OuterRef('author')
+        ).order_by('-pub_date', '-id').values('id')[:limit]
+        recipes = Recipe.objects.filter(
+            id__in=Subquery(latest)
+        ).order_by('-pub_date', '-id')
+        return User.objects.filter(
+            following__user=user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recent_recipes')
+        ).order_by('-id')
@@ -0,0 +1,4 @@
+"""
+Benchmarks run against the in-memory SQLite test settings, e.g.
+python -m benchmarks.shopping_list from the backend directory.
+"""
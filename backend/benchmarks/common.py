@@ -0,0 +1,53 @@
+import os
+import statistics
+import time
+
+import django
+
+
+def setup(database=None, migrate=True):
+    """
+    Django with the test settings, on a fresh in-memory SQLite database
+    or on the SQLite file database, e.g. one shared with subprocesses
+    and already migrated by the parent.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings_test')
+    if database is not None:
+        from django.conf import settings
+        settings.DATABASES['default']['NAME'] = database
+    django.setup()
+    if migrate:
+        from django.core.management import call_command
+        call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+def timed(function, repeat):
+    """
+    p50 and p99 of the function run time in microseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return (statistics.median(samples),
+            samples[min(len(samples) - 1, int(len(samples) * 0.99))])
+
+
+def bulk_create(model, objects):
+    """
+    bulk_create that returns the saved rows, SQLite does not set the ids.
+    """
+    last_id = model.objects.order_by('-id').values_list(
+        'id', flat=True).first() or 0
+    model.objects.bulk_create(objects)
+    return list(model.objects.filter(id__gt=last_id).order_by('id'))
+
+
+def make_users(count, prefix='user'):
+    from users.models import User
+    return bulk_create(User, (
+        User(email=f'{prefix}{i}@example.com', username=f'{prefix}{i}',
+             first_name=prefix, last_name=prefix)
+        for i in range(count)))
@@ -0,0 +1,93 @@
+"""
+p50/p99 latency of the "what can I cook" matching on 100k recipes:
+the in-process RecipeIngredientIndex against the GROUP BY query over
+IngredientRecipe it replaces, plus the index build time and the time
+of the incremental update after a recipe edit.
+"""
+import random
+import time
+
+from benchmarks.common import bulk_create, make_users, setup, timed
+
+RECIPES = 100000
+INGREDIENTS = 2000
+PER_RECIPE = (3, 12)
+QUERY_SIZES = (5, 15, 30)
+MAX_MISSING = (0, 2)
+INDEX_REPEAT = 200
+ORM_REPEAT = 10
+
+
+def main():
+    setup()
+    from django.db import transaction
+    from django.db.models import Count, F, Q
+
+    from api.cook import recipe_ingredient_index
+    from api.models import Ingredient, IngredientRecipe, Recipe
+
+    rng = random.Random(0)
+    author, = make_users(1, 'author')
+    ingredients = [ingredient.id for ingredient in bulk_create(
+        Ingredient, (Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+                     for i in range(INGREDIENTS)))]
+    # Popular ingredients (salt, onion...) are in many more recipes.
+    weights = [1 / (rank + 1) for rank in range(INGREDIENTS)]
+    recipes = bulk_create(Recipe, (
+        Recipe(author=author, name=f'recipe {i}', text='text',
+               image='recipes/image.png', cooking_time=10)
+        for i in range(RECIPES)))
+    rows = []
+    for recipe in recipes:
+        picked = set()
+        size = rng.randint(*PER_RECIPE)
+        while len(picked) < size:
+            picked.update(rng.choices(ingredients, weights, k=size))
+        rows.extend(
+            IngredientRecipe(recipe_id=recipe.id, ingredient_id=pk, amount=1)
+            for pk in list(picked)[:size])
+    IngredientRecipe.objects.bulk_create(rows)
+
+    started = time.perf_counter()
+    recipe_ingredient_index.match(ingredients[:1])
+    build = time.perf_counter() - started
+
+    # One recipe edit: the next match patches the index in place.
+    with transaction.atomic():
+        IngredientRecipe.objects.filter(recipe_id=recipes[0].id).delete()
+        recipe_ingredient_index.changed(recipes[0].id)
+    started = time.perf_counter()
+    recipe_ingredient_index.match(ingredients[:1])
+    patch = time.perf_counter() - started
+
+    def orm(ids, max_missing):
+        return list(IngredientRecipe.objects.values('recipe_id').annotate(
+            total=Count('id'),
+            matched=Count('id', filter=Q(ingredient_id__in=ids)),
+        ).filter(
+            matched__gt=0, total__lte=F('matched') + max_missing
+        ).order_by('-matched', '-recipe_id').values_list(
+            'recipe_id', 'matched', 'total'))
+
+    print(f'{RECIPES} recipes, {len(rows)} recipe ingredients, '
+          f'index built in {build:.1f} s, patched after an edit in '
+          f'{patch * 1e3:.1f} ms, microseconds')
+    print(f'{"ingredients":>11} {"missing":>7} {"matches":>7} '
+          f'{"index p50":>9} {"p99":>8} {"orm p50":>9} {"p99":>9}')
+    for size in QUERY_SIZES:
+        ids = rng.sample(ingredients[:200], size)
+        for max_missing in MAX_MISSING:
+            matches = recipe_ingredient_index.match(ids, max_missing)
+            assert len(matches) == len(orm(ids, max_missing))
+            index_p50, index_p99 = timed(
+                lambda: recipe_ingredient_index.match(ids, max_missing),
+                INDEX_REPEAT)
+            orm_p50, orm_p99 = timed(
+                lambda: orm(ids, max_missing), ORM_REPEAT)
+            print(f'{size:>11} {max_missing:>7} {len(matches):>7} '
+                  f'{index_p50:>9.0f} {index_p99:>8.0f} '
+                  f'{orm_p50:>9.0f} {orm_p99:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Feed strategies across follower distributions: fan-out on write for
+every author (push), on read for every author (pull) and the hybrid
+used by the API, fan-out below FEED_FANOUT_LIMIT followers.
+For each: feed rows written, time to publish one recipe of every
+author, and p50/p99 of reading the first feed page in microseconds.
+"""
+import random
+import time
+from io import StringIO
+
+from benchmarks.common import bulk_create, make_users, setup, timed
+
+USERS = 2000
+AUTHORS = 200
+FOLLOWS_PER_USER = 10
+RECIPES_PER_AUTHOR = 5
+HYBRID_LIMIT = 100
+READS = 300
+PAGE = 10
+
+
+def popularity(name, count):
+    """
+    Follow weights of the authors: the same for everyone, or a few
+    authors followed by most users (Zipf).
+    """
+    if name == 'uniform':
+        return [1] * count
+    return [1 / (rank + 1) for rank in range(count)]
+
+
+def pick_authors(rng, authors, weights):
+    picked = set()
+    while len(picked) < FOLLOWS_PER_USER:
+        picked.update(rng.choices(authors, weights, k=FOLLOWS_PER_USER))
+    return list(picked)[:FOLLOWS_PER_USER]
+
+
+def main():
+    setup()
+    from django.conf import settings
+    from django.core.management import call_command
+
+    from api.feed import fan_out, feed_queryset
+    from api.models import FeedItem, Follow, Recipe
+
+    rng = random.Random(0)
+    strategies = (
+        ('push', USERS + 1),
+        ('hybrid', HYBRID_LIMIT),
+        ('pull', -1),
+    )
+
+    print(f'{USERS} readers following {FOLLOWS_PER_USER} of {AUTHORS} '
+          f'authors, {RECIPES_PER_AUTHOR} recipes each, '
+          f'hybrid limit {HYBRID_LIMIT}')
+    print(f'{"followers":>9} {"strategy":>8} {"rows":>8} '
+          f'{"publish, ms":>11} {"read p50, us":>12} {"p99":>8}')
+    for distribution in ('uniform', 'zipf'):
+        authors = make_users(AUTHORS, f'{distribution}-author')
+        readers = make_users(USERS, f'{distribution}-reader')
+        recipes = bulk_create(Recipe, (
+            Recipe(author=author, name=f'recipe {i}', text='text',
+                   image='recipes/image.png', cooking_time=10)
+            for author in authors for i in range(RECIPES_PER_AUTHOR)))
+        weights = popularity(distribution, AUTHORS)
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author)
+            for reader in readers
+            for author in pick_authors(rng, authors, weights))
+        call_command('recount_counters', stdout=StringIO())
+        sample = rng.sample(readers, READS)
+
+        for strategy, limit in strategies:
+            settings.FEED_FANOUT_LIMIT = limit
+            FeedItem.objects.all().delete()
+            started = time.perf_counter()
+            for recipe in recipes:
+                fan_out(recipe)
+            publish = (time.perf_counter() - started) * 1e3 / (
+                RECIPES_PER_AUTHOR)
+            rows = FeedItem.objects.count()
+            next_reader = iter(sample).__next__
+            p50, p99 = timed(lambda: list(feed_queryset(
+                next_reader()).order_by('-pub_date', '-id').values_list(
+                'id', flat=True)[:PAGE]), READS)
+            print(f'{distribution:>9} {strategy:>8} {rows:>8} '
+                  f'{publish:>11.1f} {p50:>12.1f} {p99:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+p50/p99 latency of ingredient prefix and substring lookups served by
+the in-process catalog against the ORM queries it replaces.
+"""
+import json
+import os
+
+from benchmarks.common import setup, timed
+
+PREFIXES = ('а', 'мол', 'карт', 'сыр', 'я', 'zz')
+REPEAT = 1000
+
+
+def main():
+    setup()
+    from django.conf import settings
+
+    from api.catalog import ingredient_catalog
+    from api.models import Ingredient
+
+    path = os.path.join(settings.BASE_DIR, '..', 'data', 'ingredients.json')
+    with open(path, encoding='utf-8') as file:
+        names = {item['name']: item['measurement_unit']
+                 for item in json.load(file)}
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit=unit)
+        for name, unit in names.items())
+    ingredient_catalog.all()
+
+    cases = (
+        ('startswith', lambda prefix: ingredient_catalog.startswith(prefix),
+         lambda prefix: list(Ingredient.objects.filter(
+             name__istartswith=prefix).values(
+             'id', 'name', 'measurement_unit'))),
+        ('search', lambda prefix: ingredient_catalog.search(
+            prefix, settings.INGREDIENTS_SEARCH_LIMIT),
+         lambda prefix: list(Ingredient.objects.filter(
+             name__icontains=prefix).values(
+             'id', 'name', 'measurement_unit')[
+             :settings.INGREDIENTS_SEARCH_LIMIT])),
+    )
+    print(f'{len(names)} ingredients, {REPEAT} runs per prefix, '
+          'microseconds')
+    print(f'{"lookup":>10} {"prefix":>6} {"catalog p50":>11} '
+          f'{"p99":>7} {"orm p50":>9} {"p99":>7}')
+    for lookup, catalog, orm in cases:
+        for prefix in PREFIXES:
+            catalog_p50, catalog_p99 = timed(
+                lambda: catalog(prefix), REPEAT)
+            orm_p50, orm_p99 = timed(lambda: orm(prefix), REPEAT)
+            print(f'{lookup:>10} {prefix:>6} {catalog_p50:>11.1f} '
+                  f'{catalog_p99:>7.1f} {orm_p50:>9.1f} {orm_p99:>7.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Peak memory and time to first byte of the shopping list download
+for carts of 10, 100 and 1000 recipes, in every format.
+Every case runs in its own process on a shared SQLite file and reports
+the peak RSS of the process during the download, after a warm-up one,
+and how far it grew above the RSS the download started with.
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import bulk_create, make_users, setup
+
+CART_SIZES = (10, 100, 1000)
+FORMATS = ('txt', 'csv', 'pdf')
+URL = '/api/recipes/download_shopping_cart/?format={}'
+
+
+def memory_status():
+    """
+    Current and peak resident set size of this process in KiB.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            fields = dict(line.split(':', 1) for line in status)
+        return (int(fields['VmRSS'].split()[0]),
+                int(fields['VmHWM'].split()[0]))
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes.
+        peak = peak // 1024 if sys.platform == 'darwin' else peak
+        return peak, peak
+
+
+def reset_peak_rss():
+    """
+    Django startup sets a peak well above any download, on Linux it is
+    reset before the measured request. Elsewhere ru_maxrss is reported
+    as is and the growth is usually 0.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def populate(database):
+    """
+    Carts of every size, each of its own user, and a one-recipe cart
+    for the warm-up.
+    """
+    setup(database)
+    from api.models import Ingredient, IngredientRecipe, Recipe, ShoppingList
+
+    random.seed(0)
+    author, = make_users(1, 'author')
+    ingredients = bulk_create(Ingredient, (
+        Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+        for i in range(2000)))
+    recipes = bulk_create(Recipe, (
+        Recipe(author=author, name=f'recipe {i}', text='text',
+               image='recipes/image.png', cooking_time=10)
+        for i in range(max(CART_SIZES))))
+    IngredientRecipe.objects.bulk_create(
+        IngredientRecipe(recipe=recipe, ingredient=ingredient,
+                         amount=random.randint(1, 500))
+        for recipe in recipes
+        for ingredient in random.sample(ingredients, 10))
+    for size in (1, ) + CART_SIZES:
+        user, = make_users(1, f'cart{size}-')
+        ShoppingList.objects.bulk_create(
+            ShoppingList(user=user, recipe=recipe)
+            for recipe in recipes[:size])
+
+
+def measure(database, size, file_format):
+    """
+    One case, run in a subprocess: prints its results as JSON.
+    Loading the migrations would set the peak RSS, the database is
+    already migrated.
+    """
+    setup(database, migrate=False)
+    from rest_framework.test import APIClient
+
+    from users.models import User
+
+    client = APIClient()
+    # Warm up imports and the font registration.
+    client.force_authenticate(User.objects.get(username='cart1-0'))
+    b''.join(client.get(URL.format(file_format)).streaming_content)
+    client.force_authenticate(User.objects.get(username=f'cart{size}-0'))
+
+    reset_peak_rss()
+    baseline, _ = memory_status()
+    started = time.perf_counter()
+    response = client.get(URL.format(file_format))
+    content = iter(response.streaming_content)
+    length = len(next(content))
+    first_byte = time.perf_counter() - started
+    length += sum(len(chunk) for chunk in content)
+    total = time.perf_counter() - started
+    _, peak = memory_status()
+    print(json.dumps({
+        'first_byte': first_byte, 'total': total, 'length': length,
+        'peak': peak, 'growth': peak - baseline}))
+
+
+def main():
+    handle, database = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(handle)
+    try:
+        populate(database)
+        print(f'{"recipes":>8} {"format":>6} {"ttfb, ms":>9} '
+              f'{"total, ms":>9} {"rss, MiB":>8} {"growth, KiB":>11} '
+              f'{"size, KiB":>9}')
+        for size in CART_SIZES:
+            for file_format in FORMATS:
+                output = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.shopping_list',
+                     database, str(size), file_format],
+                    check=True, stdout=subprocess.PIPE, text=True).stdout
+                result = json.loads(output.splitlines()[-1])
+                print(f'{size:>8} {file_format:>6} '
+                      f'{result["first_byte"] * 1000:>9.1f} '
+                      f'{result["total"] * 1000:>9.1f} '
+                      f'{result["peak"] / 1024:>8.1f} '
+                      f'{result["growth"]:>11.0f} '
+                      f'{result["length"] / 1024:>9.0f}')
+    finally:
+        os.remove(database)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4:
+        measure(sys.argv[1], int(sys.argv[2]), sys.argv[3])
+    else:
+        main()
@@ -87,6 +87,22 @@ DATABASES = {
     }
 }
 
+# Cache
+# Local memory by default, set REDIS_URL to share the cache between
+# workers (requires the django-redis package).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL'),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -142,10 +158,68 @@ AUTH_USER_MODEL = 'users.User'
 
 RECIPES_LIMIT = 6
 
+# Most recipe ids accepted by one favorite/shopping cart batch request.
+RECIPES_BATCH_LIMIT = 500
+
+# Recipe image variants are generated in a local thread pool,
+# IMAGE_TASK_RUNNER can point to a callable that queues the job instead.
+IMAGE_WORKERS = 2
+IMAGE_TASK_RUNNER = os.environ.get('IMAGE_TASK_RUNNER')
+
+INGREDIENTS_SEARCH_LIMIT = 20
+
+# Lifetime of the cached tag and ingredient responses, in seconds.
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Cache versions live in the database (api.models.CacheVersion), each
+# process rereads them after CACHE_VERSION_TIMEOUT seconds. That is how
+# long a worker with a local cache may serve data invalidated by
+# another process or a management command.
+CACHE_VERSION_TIMEOUT = 5
+
+# Every process patches its "what can I cook" index with the recipes
+# changed since its last sync. It is rebuilt in the background instead
+# when more than COOK_INDEX_PATCH_LIMIT recipes changed, or when its last
+# sync is older than COOK_INDEX_RETENTION seconds, the age after which
+# the change rows are deleted.
+COOK_INDEX_PATCH_LIMIT = 1000
+COOK_INDEX_RETENTION = 3600
+
+# Lifetime of the cached followed authors, favorites and shopping cart
+# ids of a user, in seconds. A write bumps the user's version, which
+# other processes see within CACHE_VERSION_TIMEOUT.
+USER_STATE_TIMEOUT = 600
+
+# Text search configuration of the recipe search on PostgreSQL.
+RECIPES_SEARCH_CONFIG = 'russian'
+
+# Trending recipes: favorites and shopping list additions lose half
+# of their weight every TRENDING_HALF_LIFE_HOURS.
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_WINDOW_DAYS = 30
+
+# New recipes are copied into the feed of every follower (fan-out on
+# write) unless the author has more than FEED_FANOUT_LIMIT followers,
+# such authors are merged into the feed when it is read. When an author
+# drops back to the limit, the recipes they published above it are
+# copied into the feeds. Compare: python -m benchmarks.feed
+FEED_FANOUT_LIMIT = 1000
+FEED_BACKFILL_LIMIT = 100
+
+# Authenticated tokens are cached for TOKEN_CACHE_LOCAL_TIMEOUT seconds
+# in each worker (at most TOKEN_CACHE_SIZE of them) and, with a shared
+# cache backend, for TOKEN_CACHE_TIMEOUT seconds in the Django cache.
+# A logout, password change or deactivation bumps the user's version,
+# which other workers see within CACHE_VERSION_TIMEOUT.
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_LOCAL_TIMEOUT = 30
+TOKEN_CACHE_TIMEOUT = 300
+TOKEN_CACHE_SHARED = bool(os.environ.get('REDIS_URL'))
+
 REST_FRAMEWORK = {
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
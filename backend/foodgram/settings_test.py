@@ -0,0 +1,26 @@
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-media-')
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+TOKEN_CACHE_SHARED = False
+
+# Variants are rendered synchronously after commit, a pool thread would
+# share the in-memory database with the test.
+IMAGE_TASK_RUNNER = 'api.images.generate_variants'
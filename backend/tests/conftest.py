@@ -0,0 +1,120 @@
+import base64
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from rest_framework.test import APIClient
+
+from api.models import Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import User
+
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwAD'
+    'hgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+def recipe_payload(tags, ingredients, count):
+    return {
+        'name': 'recipe', 'text': 'text', 'cooking_time': 5,
+        'tags': [tag.id for tag in tags],
+        'image': 'data:image/png;base64,' + base64.b64encode(PNG).decode(),
+        'ingredients': [{'id': ingredient.id, 'amount': 10}
+                        for ingredient in ingredients[:count]],
+    }
+
+
+def walk_cursor_pages(client, url):
+    """
+    Follows the next links of a cursor-paginated list, returns the ids
+    of all results and the number of pages.
+    """
+    ids, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, response.content
+        data = response.json()
+        assert 'count' not in data
+        ids.extend(item['id'] for item in data['results'])
+        url, pages = data['next'], pages + 1
+    return ids, pages
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username, **kwargs):
+        return User.objects.create_user(
+            email=f'{username}@example.com', username=username,
+            password='password12345', first_name=username,
+            last_name=username, **kwargs)
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('reader')
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.fixture
+def tags(db):
+    return [Tag.objects.create(name=f'tag{i}', slug=f'tag{i}')
+            for i in range(3)]
+
+
+@pytest.fixture
+def ingredients(db):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ingredient {i}', measurement_unit='g')
+        for i in range(40))
+    return list(Ingredient.objects.order_by('id'))
+
+
+@pytest.fixture
+def make_recipes(author, tags, ingredients):
+    def make_recipes(count, ingredients_count=3, recipe_author=author):
+        recipes = []
+        for i in range(count):
+            recipe = Recipe(author=recipe_author, name=f'recipe {i}',
+                            text='text', cooking_time=5)
+            recipe.image.save('recipe.png', ContentFile(PNG), save=False)
+            recipe.save()
+            recipe.tags.set(tags[:i % len(tags) + 1])
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe,
+                    ingredient=ingredients[(i + j) % len(ingredients)],
+                    amount=j + 1)
+                for j in range(ingredients_count))
+            recipes.append(recipe)
+        return recipes
+    return make_recipes
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
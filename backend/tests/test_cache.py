@@ -0,0 +1,56 @@
+import pytest
+from django.core.cache import cache
+
+from api.cache import bump_version, get_version
+from api.catalog import ingredient_catalog
+from api.models import CacheVersion, Favorite, Ingredient
+from api.state import UserState
+
+
+def expire_local_cache():
+    """
+    What another worker with its own LocMemCache sees once the
+    cached version expires.
+    """
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_version_survives_the_local_cache():
+    assert get_version('tags') == ''
+    bump_version('tags')
+    version = get_version('tags')
+    assert version
+
+    expire_local_cache()
+    assert get_version('tags') == version
+
+
+@pytest.mark.django_db
+def test_bump_in_another_process_reaches_this_one(ingredients):
+    assert not ingredient_catalog.startswith('абри')
+    # Another process (e.g. load_ingredients) writes the rows and bumps
+    # the version in the database, its cache is not shared with ours.
+    Ingredient.objects.create(name='абрикос', measurement_unit='г')
+    CacheVersion.objects.update_or_create(
+        namespace='ingredients', defaults={'version': 'other'})
+    assert not ingredient_catalog.startswith('абри')
+
+    expire_local_cache()
+    assert get_version('ingredients') == 'other'
+    assert ingredient_catalog.startswith('абри')
+
+
+@pytest.mark.django_db
+def test_user_state_write_in_another_process(user, make_recipes):
+    recipe, = make_recipes(1)
+    assert not UserState(user).favorites
+    # Another worker adds the favorite and bumps the user's version in
+    # the database, our cached sets are left in place.
+    Favorite.objects.bulk_create([Favorite(user=user, recipe=recipe)])
+    CacheVersion.objects.update_or_create(
+        namespace=f'user_state:{user.id}', defaults={'version': 'other'})
+    assert not UserState(user).favorites
+
+    cache.delete(f'user_state:{user.id}:version')
+    assert UserState(user).favorites == {recipe.id}
@@ -0,0 +1,91 @@
+import pytest
+from django.test import override_settings
+
+from api.cook import recipe_ingredient_index
+from api.models import IngredientRecipe
+
+URL = '/api/recipes/cook/'
+
+
+@pytest.fixture
+def index():
+    recipe_ingredient_index.__init__()
+    yield recipe_ingredient_index
+    recipe_ingredient_index.__init__()
+
+
+def set_ingredients(recipe, ingredients):
+    IngredientRecipe.objects.filter(recipe=recipe).delete()
+    for ingredient in ingredients:
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1)
+
+
+def cook(client, ingredients, max_missing=None):
+    params = {'ingredients': [ingredient.id for ingredient in ingredients]}
+    if max_missing is not None:
+        params['max_missing'] = max_missing
+    response = client.get(URL, params)
+    assert response.status_code == 200
+    return [(recipe['name'], recipe['matched_count'],
+             recipe['missing_count'])
+            for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cook_ranking_and_max_missing(index, client, ingredients,
+                                      make_recipes):
+    salad, soup, pie = make_recipes(3)
+    set_ingredients(salad, ingredients[:2])
+    set_ingredients(soup, ingredients[:4])
+    set_ingredients(pie, ingredients[2:5])
+
+    available = ingredients[:3]
+    assert cook(client, available) == [('recipe 0', 2, 0)]
+    assert cook(client, available, 2) == [
+        ('recipe 0', 2, 0), ('recipe 1', 3, 1), ('recipe 2', 1, 2)]
+    assert cook(client, ingredients[10:12], 5) == []
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('query', [
+    '', '?max_missing=1', '?ingredients=x', '?ingredients=1&max_missing=-1',
+    '?ingredients=1&max_missing=many'])
+def test_cook_rejects_bad_parameters(client, query):
+    assert client.get(f'{URL}{query}').status_code == 400
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cook_index_is_patched_incrementally(index, client, ingredients,
+                                             make_recipes, monkeypatch):
+    recipe, = make_recipes(1)
+    set_ingredients(recipe, ingredients[:2])
+    assert cook(client, ingredients[:2]) == [('recipe 0', 2, 0)]
+
+    def fail():
+        raise AssertionError('the index was rebuilt')
+
+    monkeypatch.setattr(index, '_build', fail)
+    set_ingredients(recipe, ingredients[5:7])
+    assert cook(client, ingredients[:2]) == []
+    assert cook(client, ingredients[5:7]) == [('recipe 0', 2, 0)]
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(COOK_INDEX_PATCH_LIMIT=0)
+def test_cook_index_rebuilds_in_background(index, client, ingredients,
+                                           make_recipes, monkeypatch):
+    recipe, = make_recipes(1)
+    set_ingredients(recipe, ingredients[:2])
+    assert cook(client, ingredients[:2]) == [('recipe 0', 2, 0)]
+
+    started = []
+    monkeypatch.setattr('threading.Thread.start',
+                        lambda thread: started.append(thread))
+    set_ingredients(recipe, ingredients[5:7])
+    # The old index keeps serving until the rebuild is done.
+    assert cook(client, ingredients[:2]) == [('recipe 0', 2, 0)]
+    assert len(started) == 1
+
+    started[0].run()
+    assert cook(client, ingredients[5:7]) == [('recipe 0', 2, 0)]
@@ -0,0 +1,25 @@
+import pytest
+from django.test import override_settings
+
+from api.feed import feed_queryset
+from api.models import FeedItem, Follow
+
+
+@pytest.mark.django_db(transaction=True)
+@override_settings(FEED_FANOUT_LIMIT=2)
+def test_recipes_stay_in_feed_when_author_drops_under_limit(
+        make_user, author, make_recipes):
+    followers = [make_user(f'follower{i}') for i in range(3)]
+    for follower in followers:
+        Follow.objects.create(user=follower, author=author)
+    recipes = make_recipes(2)
+    assert not FeedItem.objects.exists()
+    for follower in followers:
+        assert set(feed_queryset(follower)) == set(recipes)
+
+    Follow.objects.filter(user=followers[0]).delete()
+
+    assert FeedItem.objects.count() == 4
+    for follower in followers[1:]:
+        assert set(feed_queryset(follower)) == set(recipes)
+    assert not feed_queryset(followers[0]).exists()
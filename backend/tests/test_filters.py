@@ -0,0 +1,56 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from api.filters import RecipeFilter
+from api.models import Favorite, Recipe, ShoppingList
+
+
+class Request:
+    def __init__(self, user):
+        self.user = user
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('param, model', [
+    ('is_favorited', Favorite), ('is_in_shopping_cart', ShoppingList)])
+def test_user_list_filters_use_unique_index(param, model, user):
+    queryset = RecipeFilter(
+        {param: '1'}, queryset=Recipe.objects.all(), request=Request(user)
+    ).qs
+    plan = queryset.explain()
+    if connection.vendor != 'sqlite':
+        pytest.skip('the plan is checked on SQLite only')
+    # The Exists subquery is an index lookup on the unique
+    # (user, recipe) constraint, not a scan of the relation table.
+    assert (f'SEARCH U0 USING INDEX sqlite_autoindex_{model._meta.db_table}'
+            in plan), plan
+    assert 'SCAN U0' not in plan, plan
+
+
+@pytest.mark.django_db(transaction=True)
+def test_dedupe_shopping_list(monkeypatch, user, author, make_recipes):
+    first, second = make_recipes(2)
+    constraint, = ShoppingList._meta.constraints
+    # SQLite rebuilds the table from the model options.
+    monkeypatch.setattr(ShoppingList._meta, 'constraints', [])
+    with connection.schema_editor() as editor:
+        editor.remove_constraint(ShoppingList, constraint)
+    monkeypatch.undo()
+    try:
+        for owner, recipe in [(user, first)] * 3 + [
+                (user, second), (author, first)]:
+            ShoppingList.objects.create(user=owner, recipe=recipe)
+        keep = ShoppingList.objects.filter(
+            user=user, recipe=first).order_by('id').first()
+
+        call_command('dedupe_shopping_list')
+
+        assert ShoppingList.objects.count() == 3
+        assert ShoppingList.objects.filter(
+            user=user, recipe=first).get() == keep
+        first.refresh_from_db()
+        assert first.shopping_list_count == 2
+    finally:
+        with connection.schema_editor() as editor:
+            editor.add_constraint(ShoppingList, constraint)
@@ -0,0 +1,105 @@
+import pytest
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+
+from api import images, signals
+from api.images import (THUMBNAIL_SIZES, generate_variants, image_version,
+                        variant_name)
+from api.models import Recipe
+
+from .conftest import recipe_payload
+
+
+@pytest.mark.django_db
+def test_same_upload_reuses_stored_image(author_client, tags, ingredients):
+    payload = recipe_payload(tags, ingredients, 1)
+    first = author_client.post('/api/recipes/', payload, format='json')
+    second = author_client.post('/api/recipes/', payload, format='json')
+    assert first.status_code == second.status_code == 201
+
+    names = set(Recipe.objects.values_list('image', flat=True))
+    assert len(names) == 1
+
+    url = f'/api/recipes/{first.json()["id"]}/'
+    response = author_client.patch(url, payload, format='json')
+    assert response.status_code == 200
+    assert set(Recipe.objects.values_list('image', flat=True)) == names
+
+
+@pytest.mark.django_db
+def test_thumbnail_view_checks_version(client, make_recipes):
+    recipe, = make_recipes(1)
+    url = f'/api/recipes/{recipe.id}/thumbnail/160/'
+    current = f'{url}?v={image_version(recipe.image.name)}'
+
+    for stale in (url, f'{url}?v=outdated'):
+        response = client.get(stale)
+        assert response.status_code == 302
+        assert response['Location'] == current
+        assert 'immutable' not in response.get('Cache-Control', '')
+
+    response = client.get(current)
+    assert response.status_code == 200
+    assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response['Content-Type'] == 'image/webp'
+
+
+@pytest.mark.django_db
+def test_thumbnails_are_image_variants(client, make_recipes):
+    recipe, = make_recipes(1)
+    assert '/thumbnail/640/?v=' in client.get(
+        f'/api/recipes/{recipe.id}/').json()['thumbnail']
+
+    generate_variants(recipe.image.name)
+    data = client.get(f'/api/recipes/{recipe.id}/').json()
+    assert data['thumbnail'].endswith(
+        variant_name(recipe.image.name, 640))
+    assert 'image_variants' not in data
+
+
+@pytest.mark.django_db
+def test_recipe_list_does_not_read_images(client, make_recipes, monkeypatch):
+    make_recipes(3)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('an image was opened')
+
+    monkeypatch.setattr(default_storage, 'open', fail)
+    response = client.get('/api/recipes/?image_size=160')
+    assert response.status_code == 200
+    assert all('/thumbnail/160/?v=' in recipe['thumbnail']
+               for recipe in response.json()['results'])
+
+
+@pytest.mark.django_db(transaction=True)
+def test_orm_save_schedules_variants(monkeypatch, make_recipes):
+    scheduled = []
+    monkeypatch.setattr(signals, 'schedule_variants', scheduled.append)
+    recipe, = make_recipes(1)
+    assert scheduled == [recipe.image.name]
+
+    Recipe.objects.get(id=recipe.id).save(update_fields=['name'])
+    assert len(scheduled) == 1
+    recipe.save()
+    assert len(scheduled) == 2
+
+
+def test_variant_job_releases_its_connection(monkeypatch):
+    calls = []
+    monkeypatch.setattr(images, 'close_old_connections',
+                        lambda: calls.append('close'))
+    monkeypatch.setattr(images, 'generate_variants',
+                        lambda name: calls.append(name))
+    images.run_generate_variants('recipes/image.png')
+    assert calls == ['close', 'recipes/image.png', 'close']
+
+
+@pytest.mark.django_db
+def test_generate_variants_of_existing_images(make_recipes):
+    recipe, = make_recipes(1)
+    paths = [variant_name(recipe.image.name, size)
+             for size in THUMBNAIL_SIZES]
+    assert not any(default_storage.exists(path) for path in paths)
+
+    call_command('generate_image_variants')
+    assert all(default_storage.exists(path) for path in paths)
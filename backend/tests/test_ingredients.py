@@ -0,0 +1,35 @@
+import pytest
+from django.db import transaction
+
+from api.catalog import ingredient_catalog
+from api.models import Ingredient
+
+
+@pytest.mark.django_db(transaction=True)
+def test_catalog_is_invalidated_after_commit(client):
+    Ingredient.objects.create(name='Молоко', measurement_unit='мл')
+    assert [item['name'] for item in ingredient_catalog.startswith('мол')
+            ] == ['Молоко']
+
+    with transaction.atomic():
+        Ingredient.objects.create(name='Мёд', measurement_unit='г')
+        Ingredient.objects.create(name='Молоко топлёное',
+                                  measurement_unit='мл')
+        # Not committed yet: the catalog still serves the old rows.
+        assert len(ingredient_catalog.startswith('мол')) == 1
+
+    response = client.get('/api/ingredients/', {'name': 'мол'})
+    assert [item['name'] for item in response.json()] == [
+        'Молоко', 'Молоко топлёное']
+
+
+@pytest.mark.django_db
+def test_search_puts_prefix_matches_first(client):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='г')
+        for name in ('сыр', 'творожный сыр', 'сырники'))
+
+    response = client.get('/api/ingredients/', {'search': 'сыр'})
+
+    assert [item['name'] for item in response.json()] == [
+        'сыр', 'сырники', 'творожный сыр']
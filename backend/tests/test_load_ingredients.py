@@ -0,0 +1,65 @@
+import io
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from api.management.commands import load_ingredients
+from api.management.commands.load_ingredients import (iter_batches, iter_csv,
+                                                      iter_json_array)
+from api.models import Ingredient
+
+ITEMS = [{'name': f'ингредиент {i}', 'measurement_unit': 'г'}
+         for i in range(50)]
+
+
+def test_json_array_is_read_in_chunks(monkeypatch):
+    monkeypatch.setattr(load_ingredients, 'CHUNK_SIZE', 16)
+    file = io.StringIO(json.dumps(ITEMS, ensure_ascii=False, indent=1))
+    assert list(iter_json_array(file)) == ITEMS
+
+
+@pytest.mark.parametrize('text', ['{"name": "соль"}', '[{"name": "соль"'])
+def test_json_that_is_not_an_array(text):
+    with pytest.raises(CommandError):
+        list(iter_json_array(io.StringIO(text)))
+
+
+def test_csv_skips_the_header():
+    file = io.StringIO('name,measurement_unit\nсоль,г\n"лук, репчатый",шт\n')
+    assert list(iter_csv(file)) == [
+        {'name': 'соль', 'measurement_unit': 'г'},
+        {'name': 'лук, репчатый', 'measurement_unit': 'шт'}]
+
+
+def test_batches_keep_the_last_unit_of_a_name():
+    items = [{'name': ' соль ', 'measurement_unit': 'г'},
+             {'name': '', 'measurement_unit': 'г'},
+             {'name': 'соль', 'measurement_unit': 'щепотка'},
+             {'name': 'лук', 'measurement_unit': 'шт'}]
+    assert list(iter_batches(items, 2)) == [
+        {'соль': 'щепотка', 'лук': 'шт'}]
+    assert list(iter_batches(items, 1)) == [
+        {'соль': 'г'}, {'соль': 'щепотка'}, {'лук': 'шт'}]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('suffix', ['.json', '.csv'])
+def test_load_inserts_and_updates(tmp_path, suffix):
+    Ingredient.objects.create(name='соль', measurement_unit='кг')
+    Ingredient.objects.create(name='перец', measurement_unit='г')
+    path = tmp_path / f'ingredients{suffix}'
+    rows = [('соль', 'г'), ('лук', 'шт'), ('соль', 'щепотка')]
+    if suffix == '.json':
+        path.write_text(json.dumps(
+            [{'name': name, 'measurement_unit': unit}
+             for name, unit in rows]), encoding='utf-8')
+    else:
+        path.write_text(''.join(f'{name},{unit}\n' for name, unit in rows),
+                        encoding='utf-8')
+
+    call_command('load_ingredients', str(path), '--batch-size', '1',
+                 stdout=io.StringIO())
+    assert dict(Ingredient.objects.values_list(
+        'name', 'measurement_unit')) == {
+        'соль': 'щепотка', 'лук': 'шт', 'перец': 'г'}
@@ -0,0 +1,62 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from api.models import Favorite, RecipeScore, ShoppingList
+
+
+def recipe_ids(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.content
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_popular_ordering(make_user, client, make_recipes):
+    old, new, liked = make_recipes(3)
+    for i in range(2):
+        Favorite.objects.create(user=make_user(f'fan{i}'), recipe=liked)
+    Favorite.objects.create(user=make_user('fan2'), recipe=old)
+
+    assert recipe_ids(client, '/api/recipes/?ordering=popular') == [
+        liked.id, old.id, new.id]
+    assert recipe_ids(client, '/api/recipes/') == [liked.id, new.id, old.id]
+
+
+@pytest.mark.django_db
+@override_settings(TRENDING_HALF_LIFE_HOURS=24, TRENDING_WINDOW_DAYS=7)
+def test_trending_scores_decay(make_user, client, make_recipes):
+    stale, fresh, forgotten, unscored = make_recipes(4)
+    now = timezone.now()
+    for i, (model, recipe, age) in enumerate((
+            (Favorite, stale, timedelta(days=1)),
+            (ShoppingList, stale, timedelta(days=1)),
+            (Favorite, fresh, timedelta()),
+            (Favorite, forgotten, timedelta(days=8)))):
+        row = model.objects.create(user=make_user(f'fan{i}'), recipe=recipe)
+        model.objects.filter(id=row.id).update(pub_date=now - age)
+
+    call_command('compute_trending_scores', stdout=StringIO())
+    scores = dict(RecipeScore.objects.values_list('recipe_id', 'score'))
+    assert set(scores) == {stale.id, fresh.id}
+    # Two events a half-life old weigh as much as one new event.
+    assert scores[stale.id] == pytest.approx(1, rel=1e-3)
+    assert scores[fresh.id] == pytest.approx(1, rel=1e-3)
+
+    Favorite.objects.filter(recipe=fresh).update(
+        pub_date=now - timedelta(hours=1))
+    call_command('compute_trending_scores', stdout=StringIO())
+    assert recipe_ids(client, '/api/recipes/?ordering=trending') == [
+        stale.id, fresh.id, unscored.id, forgotten.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [
+    '/api/recipes/?pagination=cursor&ordering=popular',
+    '/api/recipes/feed/?ordering=trending'])
+def test_cursor_pages_reject_ordering(url, user_client):
+    assert user_client.get(url).status_code == 400
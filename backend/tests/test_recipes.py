@@ -0,0 +1,169 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.cache import get_version
+from api.models import Favorite, Follow, Recipe, ShoppingList
+from users.models import User
+
+from .conftest import recipe_payload, walk_cursor_pages
+
+
+def count_queries(client, url):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries), response.json()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', ['/api/recipes/', '/api/recipes/?tags=tag1'])
+def test_recipe_list_query_count_does_not_grow_with_limit(
+        url, user, author, user_client, make_recipes):
+    recipes = make_recipes(30)
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    ShoppingList.objects.create(user=user, recipe=recipes[1])
+    Follow.objects.create(user=user, author=author)
+    separator = '&' if '?' in url else '?'
+
+    counts = {}
+    for limit in (1, 5, 25):
+        counts[limit], data = count_queries(
+            user_client, f'{url}{separator}limit={limit}')
+        assert len(data['results']) == min(limit, data['count'])
+
+    assert len(set(counts.values())) == 1, counts
+
+
+@pytest.mark.django_db
+def test_recipe_cursor_pages(user_client, make_recipes):
+    recipes = make_recipes(7, ingredients_count=1)
+    Recipe.objects.filter(id=recipes[0].id).update(
+        pub_date=recipes[-1].pub_date)
+    expected = list(Recipe.objects.order_by(
+        '-pub_date', '-id').values_list('id', flat=True))
+
+    ids, pages = walk_cursor_pages(
+        user_client, '/api/recipes/?pagination=cursor&limit=3')
+    assert ids == expected
+    assert pages == 3
+    ids, _ = walk_cursor_pages(
+        user_client, '/api/recipes/?pagination=cursor&limit=3&tags=tag1')
+    assert ids == list(Recipe.objects.filter(tags__slug='tag1').order_by(
+        '-pub_date', '-id').values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+def test_recipe_list_flags(user, author, user_client, make_recipes):
+    recipes = make_recipes(3)
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    ShoppingList.objects.create(user=user, recipe=recipes[1])
+    Follow.objects.create(user=user, author=author)
+
+    results = {recipe['id']: recipe for recipe in
+               user_client.get('/api/recipes/').json()['results']}
+
+    assert results[recipes[0].id]['is_favorited']
+    assert not results[recipes[1].id]['is_favorited']
+    assert results[recipes[1].id]['is_in_shopping_cart']
+    assert all(recipe['author']['is_subscribed']
+               for recipe in results.values())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_recipes_version_bumped_only_for_authors(make_user, user, author,
+                                                 make_recipes):
+    version = get_version('recipes')
+    make_user('newcomer')
+    user.first_name = 'Reader'
+    user.save()
+    assert get_version('recipes') == version
+
+    make_recipes(1)
+    version = get_version('recipes')
+    author.first_name = 'Author'
+    author.save()
+    assert get_version('recipes') != version
+
+
+@pytest.mark.django_db
+def test_recipe_write_query_count_does_not_grow_with_ingredients(
+        author_client, tags, ingredients):
+    counts = {}
+    for count in (3, 35):
+        payload = recipe_payload(tags, ingredients, count)
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = author_client.post(
+                '/api/recipes/', payload, format='json')
+        assert response.status_code == 201, response.json()
+        assert len(response.json()['ingredients']) == count
+        counts['create', count] = len(context.captured_queries)
+
+        payload = {'ingredients': [
+            {'id': ingredient.id, 'amount': 20}
+            for ingredient in ingredients[1:count + 1]]}
+        url = f'/api/recipes/{response.json()["id"]}/'
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = author_client.patch(url, payload, format='json')
+        assert response.status_code == 200, response.json()
+        counts['update', count] = len(context.captured_queries)
+
+    assert counts['create', 3] == counts['create', 35], counts
+    assert counts['update', 3] == counts['update', 35], counts
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('item', [{'amount': 10}, {'id': 1}])
+def test_patch_with_incomplete_ingredient_is_rejected(
+        item, author_client, make_recipes):
+    recipe, = make_recipes(1)
+    response = author_client.patch(
+        f'/api/recipes/{recipe.id}/', {'ingredients': [item]},
+        format='json')
+    assert response.status_code == 400
+    assert 'ingredients' in response.json()
+
+
+@pytest.mark.django_db
+def test_full_save_keeps_counters(user, author, make_recipes):
+    recipe, = make_recipes(1)
+    stale_recipe = Recipe.objects.get(id=recipe.id)
+    stale_author = User.objects.get(id=author.id)
+    Favorite.objects.create(user=user, recipe=recipe)
+    ShoppingList.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=user, author=author)
+
+    stale_recipe.name = 'renamed'
+    stale_recipe.save()
+    stale_author.first_name = 'renamed'
+    stale_author.set_password('another password')
+    stale_author.save()
+
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert recipe.name == 'renamed'
+    assert (recipe.favorites_count, recipe.shopping_list_count) == (1, 1)
+    assert author.first_name == 'renamed'
+    assert (author.recipes_count, author.followers_count) == (1, 1)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_user_state_is_cached_between_requests(user, author, user_client,
+                                               make_recipes):
+    recipes = make_recipes(2)
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    first, _ = count_queries(user_client, '/api/recipes/')
+
+    with CaptureQueriesContext(connection) as context:
+        assert user_client.get('/api/recipes/').status_code == 200
+    assert len(context.captured_queries) < first
+    assert not any('api_favorite' in query['sql']
+                   for query in context.captured_queries)
+
+    Favorite.objects.create(user=user, recipe=recipes[1])
+    results = user_client.get('/api/recipes/').json()['results']
+    assert all(recipe['is_favorited'] for recipe in results)
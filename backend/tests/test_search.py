@@ -0,0 +1,61 @@
+import pytest
+from django.core.management import call_command
+
+from api.models import Ingredient, IngredientRecipe, Recipe, RecipeSearchTerm
+
+
+@pytest.fixture
+def make_recipe(author, make_recipes):
+    def make_recipe(name, text='', ingredients=()):
+        recipe, = make_recipes(1, ingredients_count=0)
+        Recipe.objects.filter(id=recipe.id).update(name=name, text=text)
+        for ingredient in ingredients:
+            IngredientRecipe.objects.create(
+                recipe=recipe, amount=1,
+                ingredient=Ingredient.objects.get_or_create(
+                    name=ingredient, measurement_unit='г')[0])
+        return recipe
+    return make_recipe
+
+
+def search(client, query):
+    response = client.get('/api/recipes/', {'search': query})
+    assert response.status_code == 200
+    return [recipe['name'] for recipe in response.json()['results']]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_every_word_must_match(client, make_recipe):
+    make_recipe('Грибной суп', ingredients=['шампиньоны'])
+    make_recipe('Суп с курицей', ingredients=['курица'])
+    call_command('rebuild_search_index')
+
+    assert search(client, 'суп') == ['Суп с курицей', 'Грибной суп']
+    assert search(client, 'суп шампиньоны') == ['Грибной суп']
+    assert search(client, 'суп рыба') == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_name_ranks_above_ingredients_above_text(client, make_recipe):
+    make_recipe('Рагу', text='Подавать с морковью')
+    make_recipe('Салат', ingredients=['морковь'])
+    make_recipe('Морковь по-корейски')
+    call_command('rebuild_search_index')
+
+    assert search(client, 'морковь') == ['Морковь по-корейски', 'Салат']
+    assert search(client, 'морковью') == ['Рагу']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_index_follows_ingredient_rows(client, make_recipe):
+    recipe = make_recipe('Омлет', ingredients=['яйцо'])
+    assert search(client, 'яйцо') == ['Омлет']
+
+    IngredientRecipe.objects.create(
+        recipe=recipe, amount=1, ingredient=Ingredient.objects.create(
+            name='молоко', measurement_unit='мл'))
+    assert search(client, 'молоко') == ['Омлет']
+
+    IngredientRecipe.objects.filter(ingredient__name='яйцо').delete()
+    assert search(client, 'яйцо') == []
+    assert RecipeSearchTerm.objects.filter(recipe=recipe).exists()
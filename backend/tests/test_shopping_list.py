@@ -0,0 +1,54 @@
+import csv
+import io
+
+import pytest
+
+from api.models import ShoppingList
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+@pytest.fixture
+def cart(user, make_recipes):
+    recipes = make_recipes(2, ingredients_count=2)
+    ShoppingList.objects.bulk_create(
+        ShoppingList(user=user, recipe=recipe) for recipe in recipes)
+    return recipes
+
+
+def download(client, file_format):
+    response = client.get(URL, {'format': file_format})
+    assert response.status_code == 200
+    return response, b''.join(response.streaming_content)
+
+
+@pytest.mark.django_db
+def test_download_txt_sums_amounts(user_client, cart):
+    response, content = download(user_client, 'txt')
+
+    assert response['Content-Type'] == 'text/plain; charset=utf-8'
+    lines = content.decode().splitlines()
+    # recipe 0 uses ingredients 0 and 1, recipe 1 uses 1 and 2.
+    assert lines == ['ingredient 0 (g) - 1 ',
+                     'ingredient 1 (g) - 3 ',
+                     'ingredient 2 (g) - 2 ']
+
+
+@pytest.mark.django_db
+def test_download_csv(user_client, cart):
+    response, content = download(user_client, 'csv')
+
+    assert response['Content-Disposition'] == (
+        'attachment; filename="ShoppingList.csv"')
+    rows = list(csv.reader(io.StringIO(content.decode())))
+    assert rows[0] == ['name', 'measurement_unit', 'amount']
+    assert rows[2] == ['ingredient 1', 'g', '3']
+
+
+@pytest.mark.django_db
+def test_download_pdf_embeds_font(user_client, cart):
+    response, content = download(user_client, 'pdf')
+
+    assert response['Content-Type'] == 'application/pdf'
+    assert content.startswith(b'%PDF')
+    assert b'DejaVuSans' in content
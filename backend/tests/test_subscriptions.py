@@ -0,0 +1,61 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Follow
+
+from .conftest import walk_cursor_pages
+
+URL = '/api/users/subscriptions/'
+
+
+@pytest.fixture
+def followed(make_user, user, make_recipes):
+    """
+    Ten authors followed by the user, author i with i % 4 recipes.
+    """
+    authors = [make_user(f'followed{i}') for i in range(10)]
+    for i, author in enumerate(authors):
+        Follow.objects.create(user=user, author=author)
+        if i % 4:
+            make_recipes(i % 4, ingredients_count=1, recipe_author=author)
+    return authors
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [f'{URL}?', f'{URL}?pagination=cursor&'])
+def test_subscriptions_query_count_does_not_grow_with_limit(
+        url, followed, user_client):
+    counts = {}
+    for limit in (1, 5, 10):
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(f'{url}limit={limit}')
+        assert response.status_code == 200
+        assert len(response.json()['results']) == limit
+        counts[limit] = len(context.captured_queries)
+
+    assert len(set(counts.values())) == 1, counts
+
+
+@pytest.mark.django_db
+def test_subscriptions_cursor_pages(followed, user_client):
+    ids, pages = walk_cursor_pages(
+        user_client, f'{URL}?pagination=cursor&limit=3')
+    assert ids == sorted((author.id for author in followed), reverse=True)
+    assert pages == 4
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_limit, shown', [
+    ('1', 1), ('2', 2), ('10', 3), ('0', 0), ('many', 3)])
+def test_subscriptions_recipes_limit(recipes_limit, shown, followed,
+                                     user_client):
+    response = user_client.get(f'{URL}?recipes_limit={recipes_limit}')
+    assert response.status_code == 200
+    for author in response.json()['results']:
+        recipes = followed[int(author['username'][len('followed'):])].recipes
+        count = recipes.count()
+        assert author['recipes_count'] == count
+        latest = list(recipes.order_by('-pub_date', '-id').values_list(
+            'id', flat=True)[:shown])
+        assert [recipe['id'] for recipe in author['recipes']] == latest
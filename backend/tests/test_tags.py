@@ -0,0 +1,27 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+
+from api.models import Tag
+from api.views import TagViewSet
+
+
+def test_cached_responses_expire():
+    assert TagViewSet.cache_timeout == settings.RESPONSE_CACHE_TIMEOUT
+    assert TagViewSet.cache_timeout
+
+
+@pytest.mark.django_db(transaction=True)
+def test_tag_list_is_cached_and_invalidated(client):
+    Tag.objects.create(name='Завтрак', slug='breakfast')
+    response = client.get('/api/tags/')
+    etag = response['ETag']
+
+    assert client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag
+                      ).status_code == 304
+
+    Tag.objects.create(name='Обед', slug='lunch')
+    response = client.get('/api/tags/')
+    assert response['ETag'] != etag
+    assert len(response.json()) == 2
+    assert cache.get('tags:version') is not None
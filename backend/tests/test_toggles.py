@@ -0,0 +1,95 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api import signals, toggles
+from api.models import Favorite, Follow, Recipe, ShoppingList
+from users.models import User
+
+BATCH_URLS = {
+    Favorite: '/api/recipes/favorite/batch/',
+    ShoppingList: '/api/recipes/shopping_cart/batch/',
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model', [Favorite, ShoppingList])
+def test_batch_results_and_counters(model, user, user_client, make_recipes):
+    first, second, third = make_recipes(3)
+    model.objects.create(user=user, recipe=first)
+
+    response = user_client.post(BATCH_URLS[model], {
+        'add': [first.id, second.id, 999999],
+        'remove': [first.id, third.id, second.id],
+    }, format='json')
+
+    assert response.status_code == 200
+    assert [(item['action'], item['result'])
+            for item in response.json()['results']] == [
+        ('add', 'exists'), ('add', 'added'), ('add', 'not_found'),
+        ('remove', 'removed'), ('remove', 'absent'), ('remove', 'removed')]
+    assert not model.objects.filter(user=user).exists()
+    field = signals.COUNTER_FIELDS[model][2]
+    for recipe in (first, second, third):
+        recipe.refresh_from_db()
+        assert getattr(recipe, field) == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_runs_in_one_transaction(monkeypatch, user, user_client,
+                                       make_recipes):
+    first, second = make_recipes(2)
+    Favorite.objects.create(user=user, recipe=first)
+
+    update_counters = toggles.update_counters
+
+    def fail(sender, ids, delta):
+        if delta < 0:
+            raise RuntimeError('counter update failed')
+        update_counters(sender, ids, delta)
+
+    monkeypatch.setattr(toggles, 'update_counters', fail)
+    with pytest.raises(RuntimeError):
+        user_client.post(BATCH_URLS[Favorite], {
+            'add': [second.id], 'remove': [first.id]}, format='json')
+
+    assert set(Favorite.objects.values_list('recipe_id', flat=True)) == {
+        first.id}
+    second.refresh_from_db()
+    assert second.favorites_count == 0
+
+
+@pytest.mark.django_db
+def test_delete_of_uncounted_relations(user, author, user_client,
+                                       make_recipes):
+    recipe, = make_recipes(1)
+    Favorite.objects.create(user=user, recipe=recipe)
+    Follow.objects.create(user=user, author=author)
+    # Rows that existed before the counters were added.
+    Recipe.objects.update(favorites_count=0)
+    User.objects.update(followers_count=0)
+
+    assert user_client.delete(
+        f'/api/recipes/{recipe.id}/favorite/').status_code == 204
+    assert user_client.delete(
+        f'/api/users/{author.id}/subscribe/').status_code == 204
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert recipe.favorites_count == 0
+    assert author.followers_count == 0
+
+
+@pytest.mark.django_db
+def test_single_toggles_write_one_row(user, user_client, make_recipes):
+    recipe, = make_recipes(1)
+    url = f'/api/recipes/{recipe.id}/favorite/'
+    for method, status in (('get', 201), ('delete', 204)):
+        with CaptureQueriesContext(connection) as context:
+            assert getattr(user_client, method)(url).status_code == status
+        favorite_queries = [query['sql'] for query in context.captured_queries
+                            if 'api_favorite' in query['sql']]
+        assert len(favorite_queries) == 1, favorite_queries
+        assert not any('FOR UPDATE' in query['sql']
+                       for query in context.captured_queries)
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 0
@@ -0,0 +1,112 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.models import CacheVersion, Follow
+from users.authentication import token_cache
+
+
+@pytest.fixture
+def token_client(author):
+    token_cache._entries.clear()
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=author).key}')
+    return client
+
+
+def token_queries(context):
+    return [query for query in context.captured_queries
+            if 'authtoken_token' in query['sql']]
+
+
+@pytest.mark.django_db
+def test_reads_use_cached_token(token_client):
+    assert token_client.get('/api/users/me/').status_code == 200
+    with CaptureQueriesContext(connection) as context:
+        assert token_client.get('/api/users/me/').status_code == 200
+    assert not token_queries(context)
+
+
+@pytest.mark.django_db
+def test_writes_do_not_save_cached_user(token_client, user, author):
+    assert token_client.get('/api/users/me/').status_code == 200
+    Follow.objects.create(user=user, author=author)
+
+    with CaptureQueriesContext(connection) as context:
+        response = token_client.post('/api/users/set_password/', {
+            'current_password': 'password12345',
+            'new_password': 'another password 12345'})
+    assert response.status_code == 204, response.content
+    assert token_queries(context)
+
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    assert author.check_password('another password 12345')
+
+
+@pytest.mark.django_db
+def test_cached_token_logout_in_another_process(token_client, author):
+    assert token_client.get('/api/users/me/').status_code == 200
+    # Another worker deletes the token and bumps the user's version in
+    # the database, our cached entry is left in place.
+    Token.objects.filter(user=author).update(key='other')
+    CacheVersion.objects.update_or_create(
+        namespace=f'auth_token:user:{author.id}',
+        defaults={'version': 'other'})
+    assert token_client.get('/api/users/me/').status_code == 200
+
+    cache.delete(f'auth_token:user:{author.id}:version')
+    assert token_client.get('/api/users/me/').status_code == 401
+
+
+@pytest.fixture
+def staff(make_user):
+    return make_user('staff', is_staff=True)
+
+
+@pytest.fixture
+def staff_client(staff):
+    client = APIClient()
+    client.force_authenticate(staff)
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [
+    '/api/users/?', '/api/users/?pagination=cursor&',
+    '/api/users/?search=user&'])
+def test_user_list_query_count_does_not_grow_with_limit(
+        url, make_user, staff, staff_client):
+    users = [make_user(f'user{i}') for i in range(30)]
+    for author in users[:10]:
+        Follow.objects.create(user=staff, author=author)
+
+    counts = {}
+    for limit in (1, 5, 25):
+        with CaptureQueriesContext(connection) as context:
+            response = staff_client.get(f'{url}limit={limit}')
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert len(results) == limit
+        counts[limit] = len(context.captured_queries)
+
+    assert len(set(counts.values())) == 1, counts
+    subscribed = {user['username']: user['is_subscribed']
+                  for user in results}
+    assert subscribed['user0'] and subscribed['user9']
+    assert not subscribed.get('user10', False)
+
+
+@pytest.mark.django_db
+def test_shared_token_hit_is_not_shared_with_the_request(settings, author):
+    settings.TOKEN_CACHE_SHARED = True
+    token_cache.set('key', author)
+    token_cache._entries.clear()
+
+    user = token_cache.get('key')
+    user.first_name = 'changed by the request'
+    assert token_cache.get('key').first_name == author.first_name
@@ -0,0 +1,133 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+
+from api.cache import bump_version, get_version
+
+
+def token_namespace(user_id):
+    return f'auth_token:user:{user_id}'
+
+
+class TokenCache:
+    """
+    token key -> user, in a process-local LRU with a TTL and, with
+    TOKEN_CACHE_SHARED, in the Django cache shared by the workers.
+    Every entry carries the user's version, kept in the database by
+    api.cache, and is dropped once it changes: a logout, a password
+    change or a deactivation in one worker locks the token out of the
+    others within CACHE_VERSION_TIMEOUT. Every request gets its own
+    copy of the user.
+    """
+
+    def __init__(self, size, timeout):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.size = size
+        self.timeout = timeout
+
+    @staticmethod
+    def shared_key(key):
+        return f'auth_token:{key}'
+
+    @staticmethod
+    def is_current(user, version):
+        return get_version(token_namespace(user.id)) == version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+            else:
+                self._entries.pop(key, None)
+                entry = None
+        if entry is not None:
+            user, _, version = entry
+            if self.is_current(user, version):
+                return copy.deepcopy(user)
+            self.delete(key)
+            return None
+        if not settings.TOKEN_CACHE_SHARED:
+            return None
+        entry = cache.get(self.shared_key(key))
+        if entry is None:
+            return None
+        user, version = entry
+        if not self.is_current(user, version):
+            return None
+        self._set_local(key, copy.deepcopy(user), version)
+        return user
+
+    def set(self, key, user):
+        version = get_version(token_namespace(user.id))
+        self._set_local(key, copy.deepcopy(user), version)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(self.shared_key(key), (user, version),
+                      settings.TOKEN_CACHE_TIMEOUT)
+
+    def _set_local(self, key, user, version):
+        with self._lock:
+            self._entries[key] = (
+                user, time.monotonic() + self.timeout, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.delete(self.shared_key(key))
+
+    def delete_user(self, user_id):
+        """
+        Drops the tokens of the user in every process, e.g. after
+        a logout or a password change.
+        """
+        bump_version(token_namespace(user_id))
+        with self._lock:
+            keys = [key for key, (user, _, _) in self._entries.items()
+                    if user.id == user_id]
+        for key in keys:
+            self.delete(key)
+
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE,
+                         settings.TOKEN_CACHE_LOCAL_TIMEOUT)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that looks the token up in token_cache first,
+    so authenticated read requests usually run no authentication query.
+    Write requests always load the user from the database: a cached
+    copy may hold stale counters and other fields, and views like
+    set_password or the profile update save the whole user.
+    """
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not getattr(self, 'use_cache', True):
+            return super().authenticate_credentials(key)
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            return user, token
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
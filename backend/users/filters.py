@@ -0,0 +1,22 @@
+import django_filters as filters
+from django.db.models import Q
+
+from .models import User
+
+
+class UserFilter(filters.FilterSet):
+    search = filters.CharFilter(method='get_search')
+
+    class Meta:
+        model = User
+        fields = ('search',)
+
+    def get_search(self, queryset, name, value):
+        """
+        Prefix match on username or email, see create_user_search_indexes.
+        """
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.filter(
+            Q(username__istartswith=value) | Q(email__istartswith=value))
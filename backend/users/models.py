@@ -2,7 +2,27 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 
 
-class User(AbstractUser):
+class ProtectedFieldsMixin:
+    """
+    Leaves the protected_fields out of a save() that does not name them
+    in update_fields. They are kept up to date with F() expressions, so
+    the values loaded with the instance may be stale and must not be
+    written back by a full save.
+    """
+    protected_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not args
+                and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.protected_fields]
+        super().save(*args, **kwargs)
+
+
+class User(ProtectedFieldsMixin, AbstractUser):
     """User model."""
     email = models.EmailField(max_length=100,
                               verbose_name="email",
@@ -14,6 +34,14 @@ class User(AbstractUser):
                                   verbose_name="first_name")
     last_name = models.CharField(max_length=150,
                                  verbose_name="last_name")
+    recipes_count = models.PositiveIntegerField(default=0,
+                                                editable=False,
+                                                verbose_name="recipes_count")
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="followers_count")
+    protected_fields = ('recipes_count', 'followers_count')
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
@@ -0,0 +1,46 @@
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import User
+
+USER_SEARCH_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS users_user_username_upper '
+    'ON users_user (UPPER("username"::text) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS users_user_email_upper '
+    'ON users_user (UPPER("email"::text) varchar_pattern_ops)',
+)
+
+
+def create_user_search_indexes(sender, **kwargs):
+    """
+    Indexes for the username/email prefix search on PostgreSQL.
+    They match the UPPER(...) LIKE 'prefix%' expression Django builds
+    for istartswith, which the unique indexes cannot serve.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for index in USER_SEARCH_INDEXES:
+            cursor.execute(index)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+    token_cache.delete_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields,
+                           **kwargs):
+    """
+    Any change but a login makes the cached user stale, and a new
+    password or deactivation must lock the token out at once.
+    """
+    if created or (update_fields is not None
+                   and set(update_fields) <= {'last_login'}):
+        return
+    token_cache.delete_user(instance.id)
@@ -0,0 +1,27 @@
+from django.db.models import BooleanField, Exists, OuterRef, Value
+from djoser.views import UserViewSet as BaseUserViewSet
+
+from api.models import Follow
+from api.paginators import (CursorPaginationMixin, CustomPageNumberPaginator,
+                            UserCursorPaginator)
+from .filters import UserFilter
+
+
+class UserViewSet(CursorPaginationMixin, BaseUserViewSet):
+    """
+    Djoser users endpoints with is_subscribed annotated in the query,
+    ?search= by username or email prefix and ?pagination=cursor.
+    """
+    pagination_class = CustomPageNumberPaginator
+    cursor_pagination_class = UserCursorPaginator
+    filterset_class = UserFilter
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            is_subscribed = Value(False, output_field=BooleanField())
+        else:
+            is_subscribed = Exists(Follow.objects.filter(
+                user=user, author=OuterRef('pk')))
+        return super().get_queryset().annotate(
+            is_subscribed=is_subscribed).order_by('id')